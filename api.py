@@ -0,0 +1,252 @@
+"""Serve the leaderboards and header metrics as JSON over HTTP, beside the Streamlit app.
+
+Responses come from the precomputed exports when they are current, else from the app's shared caches.
+Every response carries an ETag derived from the dataset version and the engine code, so polling
+clients that send If-None-Match get an empty 304 until a match file, the team mapping or a
+leaderboard definition changes.
+
+    python api.py
+    python api.py --host 0.0.0.0 --port 8502
+
+Endpoints:
+    GET /metrics                  total goals and players played
+    GET /stats                    every leaderboard with its description and URL
+    GET /stats/<slug>             one leaderboard; optional query parameters:
+                                  team, position (not form tables), first, last (matchids),
+                                  limit, offset, window (form tables: matches per player)
+"""
+import argparse
+import hashlib
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import streamlit  # noqa: F401  (imported first so the logger level below sticks)
+
+# engine.py calls Streamlit at import and while loading; outside `streamlit run` those calls only log warnings
+logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').setLevel(logging.ERROR)
+import engine  # noqa: E402
+from datafiles import dataset_version  # noqa: E402
+from precompute import slugify  # noqa: E402
+
+# Input files are re-stat'ed at most this often, so a burst of polls costs one version check
+VERSION_TTL_SECONDS = 1.0
+# Serialized response bodies kept per dataset version and request
+RESPONSE_CACHE_ENTRIES = 256
+# One entity tag in an If-None-Match list, weak or strong
+ENTITY_TAG = re.compile(r'(?:W/)?("[^"]*")')
+
+STAT_SLUGS = {slugify(stat_name): stat_name for stat_name in engine.STAT_FUNCTIONS}
+
+_version_state: Dict[str, Any] = {"version": None, "checked": 0.0}
+_responses: "OrderedDict[str, bytes]" = OrderedDict()
+_lock = threading.Lock()
+
+class BadRequest(ValueError):
+    """A query parameter the API cannot use."""
+
+# Function to read the dataset version without re-stat'ing the inputs on every request
+def current_version() -> str:
+    """dataset_version(), reused for VERSION_TTL_SECONDS."""
+    with _lock:
+        now = time.monotonic()
+        if _version_state["version"] is None or now - _version_state["checked"] >= VERSION_TTL_SECONDS:
+            _version_state.update(version=dataset_version(), checked=now)
+        return _version_state["version"]
+
+# Function to tag one response
+def make_etag(version: str, request_key: str) -> str:
+    """Strong ETag from the dataset version, the engine code and the normalized request, so it changes with any of them.
+
+    The engine part is engine.ENGINE_VERSION, the same tag exports must carry to be served, so a body
+    is never tagged with a newer engine than the one that built it.
+    """
+    digest = hashlib.sha256(f"{engine.ENGINE_VERSION}\n{request_key}".encode("utf-8")).hexdigest()[:12]
+    return '"%s-%s"' % (version, digest)
+
+# Function to evaluate an If-None-Match header
+def none_match(header: str, etag: str) -> Optional[bool]:
+    """Whether a listed tag matches etag by weak comparison (RFC 9110 8.8.3.2); None for "*", which matches any current representation."""
+    if header.strip() == "*":
+        return None
+    return etag in ENTITY_TAG.findall(header)
+
+# Function to load what every response needs for the current version
+def load_sources(version: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Precomputed exports when they are current, else the shared dataset; (None, None) if no data loads."""
+    engine.record_cache("exports", lookups=1)
+    exported = engine.load_exported_leaderboards(version)
+    if exported is not None:
+        return exported, None
+    engine.record_cache("dataset", lookups=1)
+    dataset = engine.load_shared_dataset(version)
+    return None, dataset if dataset["summary"] is not None else None
+
+# Function to read the leaderboard query parameters
+def parse_board_query(query: Dict[str, list], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Filters and paging as fetch_leaderboard_page takes them; a window covering the season means no window."""
+    def single(name: str) -> Optional[str]:
+        values = query.get(name)
+        return values[-1] if values else None
+
+    def integer(name: str, minimum: int) -> Optional[int]:
+        value = single(name)
+        if value is None:
+            return None
+        try:
+            number = int(value)
+        except ValueError:
+            raise BadRequest(f"{name} must be an integer") from None
+        if number < minimum:
+            raise BadRequest(f"{name} must be at least {minimum}")
+        return number
+
+    team, position = single("team"), single("position")
+    if team is not None and team not in options["teams"]:
+        raise BadRequest(f"unknown team '{team}'")
+    if position is not None and position not in options["positions"]:
+        raise BadRequest(f"unknown position '{position}'")
+    matchids = options["matchids"]
+    first, last = integer("first", 0), integer("last", 0)
+    if matchids and (first is not None or last is not None):
+        first = matchids[0] if first is None else first
+        last = matchids[-1] if last is None else last
+        if first > last:
+            raise BadRequest("first must not be after last")
+        if (first, last) == (matchids[0], matchids[-1]):
+            first = last = None
+    return {
+        "filters": {
+            "first": first, "last": last, "team": team, "position": position,
+            "form_window": integer("window", 1) or engine.FORM_WINDOW,
+        },
+        "limit": integer("limit", 1),
+        "offset": integer("offset", 0) or 0,
+    }
+
+# Function to build the body of one request
+def build_response(path: str, query: Dict[str, list], version: str) -> Tuple[int, Dict[str, Any]]:
+    """Status code and JSON document for a GET on path."""
+    parts = [part for part in path.split("/") if part]
+    if parts == ["stats"]:
+        stats = [
+            {"name": stat_name, "slug": slug, "desc": engine.STAT_FUNCTIONS[stat_name]["desc"],
+             "level": engine.STAT_FUNCTIONS[stat_name]["level"], "url": f"/stats/{slug}"}
+            for slug, stat_name in STAT_SLUGS.items()
+        ]
+        return 200, {"version": version, "stats": stats}
+    if parts != ["metrics"] and not (len(parts) == 2 and parts[0] == "stats"):
+        return 404, {"error": f"unknown path '{path}'"}
+    if parts[0] == "stats" and parts[1] not in STAT_SLUGS:
+        return 404, {"error": f"unknown leaderboard '{parts[1]}'"}
+
+    exported, dataset = load_sources(version)
+    if exported is None and dataset is None:
+        return 503, {"error": "no match data could be loaded"}
+    if parts == ["metrics"]:
+        metrics = exported["metrics"] if exported is not None else dataset
+        return 200, {
+            "version": version,
+            "total_goals": int(metrics["total_goals"]),
+            "players_played": int(metrics["players_played"]),
+        }
+
+    stat_name = STAT_SLUGS[parts[1]]
+    try:
+        request = parse_board_query(query, (exported if exported is not None else dataset)["filters"])
+        # Form tables cover each player's last matches in any position, so a position filter would be ignored
+        if engine.STAT_FUNCTIONS[stat_name]["level"] == "form" and request["filters"]["position"] is not None:
+            raise BadRequest("position does not apply to form leaderboards")
+    except BadRequest as e:
+        return 400, {"error": str(e)}
+    page = engine.fetch_leaderboard_page(stat_name, version, exported, request["filters"], request["limit"], request["offset"])
+    return 200, {
+        "name": stat_name,
+        "desc": engine.STAT_FUNCTIONS[stat_name]["desc"],
+        "version": version,
+        **request["filters"],
+        "offset": request["offset"],
+        "total_rows": page.attrs["total_rows"],
+        **json.loads(page.to_json(orient="split", index=False)),
+    }
+
+class LeaderboardHandler(BaseHTTPRequestHandler):
+    """GET-only JSON handler with ETag revalidation."""
+
+    server_version = "PorkkalamAPI/1.0"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        version = current_version()
+        # The tag is known before any data is touched, so a revalidation costs one lookup
+        request_key = json.dumps([url.path.rstrip("/"), sorted(query.items())])
+        etag = make_etag(version, request_key)
+        matched = none_match(self.headers.get("If-None-Match", ""), etag)
+        if matched:
+            self.send_not_modified(etag)
+            return
+
+        cache_key = f"{version}:{request_key}"
+        with _lock:
+            body = _responses.get(cache_key)
+            if body is not None:
+                _responses.move_to_end(cache_key)
+        status = 200
+        if body is None:
+            try:
+                status, document = build_response(url.path, query, version)
+            except Exception as e:
+                status, document = 500, {"error": f"Error calculating statistics: {e}"}
+            body = json.dumps(document).encode("utf-8")
+            if status == 200:
+                with _lock:
+                    _responses[cache_key] = body
+                    while len(_responses) > RESPONSE_CACHE_ENTRIES:
+                        _responses.popitem(last=False)
+
+        if status == 200 and matched is None:
+            # "*" matches whenever the request has a current representation
+            self.send_not_modified(etag)
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 200:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_not_modified(self, etag: str) -> None:
+        """Empty 304 carrying the current tag."""
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serve the leaderboards and metrics as JSON.")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on")
+    parser.add_argument("--port", type=int, default=8502, help="port to listen on")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), LeaderboardHandler)
+    print(f"Serving leaderboards on http://{args.host}:{args.port}/stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
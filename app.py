@@ -1,7 +1,9 @@
 import streamlit as st
-import pandas as pd
-import os
-from typing import List, Dict, Callable, Any
+import sys
+import types
+from typing import List, Dict, Any
+
+from datafiles import dataset_version, load_startup_summary
 
 # Set page title and configuration
 st.set_page_config(
@@ -10,475 +12,210 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Local directory information
-CSV_DIR = "csvfiles"  # Directory containing CSV files
-EXCEL_DIR = "impfiles"  # Directory containing Excel files
-TEAM_MAPPING_FILE = os.path.join(EXCEL_DIR, "Team IDs.xlsx")
-
-# Function to fetch all CSV files from local directory
-def fetch_csv_files_local() -> pd.DataFrame:
-    """Fetch and merge all CSV files from the local csvfiles directory."""
-    try:
-        # Check if directory exists
-        if not os.path.exists(CSV_DIR):
-            st.error(f"Directory {CSV_DIR} not found.")
-            return pd.DataFrame()
-        
-        # Get all CSV files in the directory
-        csv_files = [f for f in os.listdir(CSV_DIR) if f.lower().endswith('.csv')]
-        
-        if not csv_files:
-            st.error(f"No CSV files found in {CSV_DIR} directory.")
-            return pd.DataFrame()
-        
-        # Fetch and merge all CSV files
-        all_dfs = []
-        for file_name in csv_files:
-            with st.spinner(f"Loading {file_name}..."):
-                file_path = os.path.join(CSV_DIR, file_name)
-                
-                # Read CSV file
-                try:
-                    df = pd.read_csv(file_path, encoding='ISO-8859-1')
-                    all_dfs.append(df)
-                    # st.success(f"Loaded {file_name}")
-                except Exception as e:
-                    st.warning(f"Error reading {file_name}: {str(e)}")
-        
-        if all_dfs:
-            # Concatenate all DataFrames
-            merged_df = pd.concat(all_dfs, ignore_index=True)
-            return merged_df
-        else:
-            st.error("Failed to load any CSV files.")
-            return pd.DataFrame()
-            
-    except Exception as e:
-        st.error(f"Error accessing local directory: {str(e)}")
-        return pd.DataFrame()
-
-# Function to fetch team mapping from local file
-def fetch_team_mapping_local() -> pd.DataFrame:
-    """Fetch team mapping Excel file from local directory."""
-    try:
-        with st.spinner(f"Loading team mapping file..."):
-            # Check if file exists
-            if not os.path.exists(TEAM_MAPPING_FILE):
-                st.error(f"Team mapping file not found at {TEAM_MAPPING_FILE}")
-                return pd.DataFrame()
-            
-            # Read Excel file
-            team_mapping = pd.read_excel(TEAM_MAPPING_FILE)
-            # st.success("Team mapping loaded successfully")
-            return team_mapping
-            
-    except Exception as e:
-        st.error(f"Error fetching team mapping file: {str(e)}")
-        return pd.DataFrame()
-
-# Statistics functions - keeping all the same functions from your original code
-def Goals_stats(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['team', 'playerid', 'Player_FN']).agg(
-        Matches=('matchid', 'nunique'),
-        Goals=('Goals', 'sum')
-    ).reset_index()
-    df_summary = df_summary.sort_values(by=['Goals', 'Matches'], ascending=[False, True])
-    df_summary['Rank'] = df_summary['Goals'].rank(method='dense', ascending=False).astype(int)
-    df_summary = df_summary[['Rank', 'Player_FN', 'team', 'Goals']].rename(columns={'Player_FN': 'Name','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    df_summary = df_summary[df_summary['Goals'] != 0]
-    return df_summary
-
-def Goals_statst(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['team']).agg(
-        Matches=('matchid', 'nunique'),
-        Goals=('Goals', 'sum')
-    ).reset_index()
-    df_summary = df_summary.sort_values(by=['Goals', 'Matches'], ascending=[False, True])
-    df_summary['Rank'] = df_summary['Goals'].rank(method='dense', ascending=False).astype(int)
-    df_summary = df_summary[['Rank', 'team', 'Goals']].rename(columns={'team':'Team'})
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def Goalsd_stats(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['team', 'playerid', 'Player_FN']).agg(
-        Matches=('matchid', 'nunique'),
-        Goals=('Goals', 'sum'),
-        Left=('left_goals', 'sum'),
-        Right=('right_goals', 'sum'),
-        Head=('head_goals', 'sum'),
-        Penalty=('penalty_goals', 'sum')
-    ).reset_index()
-    df_summary = df_summary.sort_values(by=['Goals', 'Matches'], ascending=[False, True])
-    df_summary['Rank'] = df_summary['Goals'].rank(method='dense', ascending=False).astype(int)
-    df_summary = df_summary[['Rank', 'Player_FN', 'team','Left','Right','Head','Penalty', 'Goals']].rename(columns={'Player_FN': 'Name','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    df_summary = df_summary[df_summary['Goals'] != 0]
-    return df_summary
-
-def shotsd_stats(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['team', 'playerid', 'Player_FN']).agg(
-        Matches=('matchid', 'nunique'),
-        Goals=('Goals', 'sum'),
-        Shots=('shots', 'sum'),
-        ShotsOT=('shots_on_target', 'sum')
-    ).reset_index()
-    df_summary = df_summary[df_summary['Shots'] > 0]
-    df_summary['Shots Per Match']=df_summary['Shots']/df_summary['Matches']
-    df_summary['Shots Per Match']=df_summary['Shots Per Match'].round(1)
-    df_summary['Shots On Target Per Match']=df_summary['ShotsOT']/df_summary['Matches']
-    df_summary['Shots On Target Per Match']=df_summary['Shots On Target Per Match'].round(1)
-    df_summary['Goals Per Match']=df_summary['Goals']/df_summary['Matches']
-    df_summary['Goals Per Match']=df_summary['Goals Per Match'].round(1)
-    df_summary = df_summary.sort_values(by=['Shots Per Match'], ascending=[False])
-    df_summary = df_summary[['Player_FN', 'team','Shots Per Match','Shots On Target Per Match','Goals Per Match']].rename(columns={'Player_FN': 'Name','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def shotsd_statst(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['team']).agg(
-        Matches=('matchid', 'nunique'),
-        Goals=('Goals', 'sum'),
-        Shots=('shots', 'sum'),
-        ShotsOT=('shots_on_target', 'sum')
-    ).reset_index()
-    df_summary['Shots Per Match']=df_summary['Shots']/df_summary['Matches']
-    df_summary['Shots Per Match']=df_summary['Shots Per Match'].round(1)
-    df_summary['Shots On Target Per Match']=df_summary['ShotsOT']/df_summary['Matches']
-    df_summary['Shots On Target Per Match']=df_summary['Shots On Target Per Match'].round(1)
-    df_summary['Goals Per Match']=df_summary['Goals']/df_summary['Matches']
-    df_summary['Goals Per Match']=df_summary['Goals Per Match'].round(1)
-    df_summary = df_summary.sort_values(by=['Shots Per Match'], ascending=[False])
-    df_summary = df_summary[['team','Shots Per Match','Shots On Target Per Match','Goals Per Match']].rename(columns={'team':'Team'})
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def Assists_stats(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg(
-        Matches=('matchid', 'nunique'), 
-        Assists=('Assists', 'sum') 
-    ).reset_index()
-    df_summary = df_summary.sort_values(by=['Assists', 'Matches'], ascending=[False, True])
-    df_summary['Rank'] = df_summary['Assists'].rank(method='dense', ascending=False).astype(int)
-    df_summary = df_summary[['Rank', 'Player_FN','team', 'Assists',]].rename(columns={'Player_FN': 'Name','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    df_summary = df_summary[df_summary['Assists'] != 0]
-    return df_summary
-
-def GA(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team'], as_index=False).agg(
-        Matches=('matchid', 'nunique'),
-        Goals=('Goals', 'sum'),
-        Assists=('Assists', 'sum')
+# Leaderboard paging
+PAGE_SIZES = [10, 20, 50, 100]
+DEFAULT_PAGE_SIZE = 20
+
+# Number of each player's most recent matches the form tables and trend charts start with
+DEFAULT_FORM_WINDOW = 5
+
+# Function to import the data engine on first use
+def load_engine() -> types.ModuleType:
+    """Import engine.py, and with it pandas and numpy, only once a view needs data."""
+    import engine
+    return engine
+
+# Function to render the sidebar filters
+def render_filters(options: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """Match-window, team and position filters; None means no restriction."""
+    st.sidebar.header("Filters")
+    matchids = options["matchids"]
+    first = last = None
+    window = st.sidebar.radio("Matches", ["Whole season", "Last N matches", "Match range"])
+    if window == "Last N matches" and matchids:
+        count = st.sidebar.number_input("Number of matches", min_value=1, max_value=len(matchids), value=min(5, len(matchids)))
+        first, last = matchids[-int(count)], matchids[-1]
+    elif window == "Match range" and matchids:
+        first, last = st.sidebar.select_slider("Match IDs", options=matchids, value=(matchids[0], matchids[-1]))
+    if matchids and (first, last) == (matchids[0], matchids[-1]):
+        first = last = None
+    team = st.sidebar.selectbox("Team", ["All teams"] + options["teams"])
+    position = st.sidebar.selectbox("Position", ["All positions"] + options["positions"])
+    return {
+        "first": first,
+        "last": last,
+        "team": None if team == "All teams" else team,
+        "position": None if position == "All positions" else position,
+    }
+
+# Function to render the player profile page
+def render_player_page(version: str) -> None:
+    """Search players by name or playerid and show one player's season totals and match log."""
+    st.subheader("Player Profile")
+    engine = load_engine()
+    engine.record_cache("player_index", lookups=1)
+    with st.spinner("Loading players..."):
+        index = engine.load_player_index(version)
+    query = st.text_input("Search player", placeholder="Start of a name, or a player ID")
+    if not query.strip():
+        st.info("Type the start of a player's name.")
+        return
+    codes = engine.search_players(index, query)
+    if not codes:
+        st.warning(f"No players match '{query}'.")
+        return
+    code = st.selectbox(
+        "Player", codes,
+        format_func=lambda code: f"{index['names'][code]} ({index['teams'][code]}, {index['ids'][code]})",
     )
-    
-    df_summary['GA'] = df_summary['Goals'] + df_summary['Assists']
-    df_summary = df_summary[df_summary['GA'] != 0]  # Remove players with 0 GA
-    
-    df_summary = df_summary.sort_values(by=['GA', 'Matches'], ascending=[False, True])
-    df_summary['Rank'] = df_summary['GA'].rank(method='dense', ascending=False).astype(int)
-    
-    df_summary = df_summary[['Rank', 'Player_FN', 'team', 'GA']].rename(columns={'Player_FN': 'Name', 'team': 'Team','GA':'Goals + Assists'})
-    df_summary['Name'] = df_summary['Name'].str.title()  # Convert names to title case
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def cc(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg(
-        Matches=('matchid', 'nunique'),  
-        Chances=('chances_created', 'sum') 
-    ).reset_index()
-    df_summary = df_summary.sort_values(by=['Chances', 'Matches'], ascending=[False, True])
-    df_summary['Rank'] = df_summary['Chances'].rank(method='dense', ascending=False).astype(int)
-    df_summary = df_summary[df_summary['Chances'] != 0]
-    df_summary = df_summary[['Rank', 'Player_FN','team', 'Chances']].rename(
-        columns={'Player_FN': 'Name', 'Chances': 'Chances Created','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    df_summary = df_summary.drop(columns=['Rank'])
-    return df_summary
-
-def shot_accuracy(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg(
-        Matches=('matchid', 'nunique'), 
-        Shots_On_Target=('shots_on_target', 'sum'),  
-        Shots=('shots', 'sum')  
-    ).reset_index()
-
-    df_summary['Shot_Accuracy'] = (df_summary['Shots_On_Target'] / df_summary['Shots']) * 100
-    df_summary['Shot_Accuracy'] = df_summary['Shot_Accuracy'].fillna(0).round(1)
-    df_summary=df_summary[df_summary['Matches']>=3]
-    df_summary = df_summary.sort_values(by='Shot_Accuracy', ascending=False)
-    df_summary = df_summary[(df_summary['Matches'] > df_summary['Matches'].median()) & (df_summary['Shots'] != 0)]
-    df_summary = df_summary[['Player_FN','team','Shots', 'Shot_Accuracy']].rename(columns={'Player_FN': 'Name','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def fouls_stats(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg(
-        Matches=('matchid', 'nunique'), 
-        Fouls=('fouls', 'sum') 
-    ).reset_index()
-    df_summary = df_summary.sort_values(by='Fouls', ascending=False)
-    df_summary['Rank'] = df_summary['Fouls'].rank(method='dense', ascending=False).astype(int)
-    df_summary = df_summary[['Rank', 'Player_FN','team', 'Fouls']].rename(columns={'Player_FN': 'Name','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    df_summary = df_summary[df_summary['Fouls'] != 0]
-    return df_summary
-
-def yc_stats(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg(
-        Yellow=('yellow_cards', 'sum') 
-    ).reset_index()
-    df_summary = df_summary.sort_values(by='Yellow', ascending=False)
-    df_summary = df_summary[['Player_FN','team', 'Yellow']].rename(
-        columns={'Player_FN': 'Name', 'Yellow': 'Yellow Cards','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    df_summary = df_summary[df_summary['Yellow Cards'] != 0]
-    return df_summary
-
-def rc_stats(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg( 
-        Red=('red_cards', 'sum') 
-    ).reset_index()
-    df_summary = df_summary.sort_values(by='Red', ascending=False)
-    df_summary = df_summary[['Player_FN','team', 'Red']].rename(
-        columns={'Player_FN': 'Name', 'Red': 'Red Cards','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    df_summary = df_summary[df_summary['Red Cards'] != 0]
-    return df_summary
-
-def offsides_stats(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg(
-        Offside=('offsides', 'sum') 
-    ).reset_index()
-    df_summary = df_summary.sort_values(by='Offside', ascending=False)
-    df_summary = df_summary[['Player_FN','team', 'Offside']].rename(columns={'Player_FN': 'Name','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    df_summary = df_summary[df_summary['Offside'] != 0]
-    return df_summary
-
-def tackles_90(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg(
-        Matches=('matchid', 'nunique'),  
-        Tackles=('tackles', 'sum') 
-    ).reset_index()
-    df_summary['Tackles_per90'] = df_summary['Tackles'] / df_summary['Matches']
-    df_summary['Tackles_per90'] = df_summary['Tackles_per90'].round(1)
-    df_summary = df_summary.sort_values(by='Tackles_per90', ascending=False)
-    df_summary = df_summary[(df_summary['Tackles_per90'] != 0) & (df_summary['Matches']>=3)] #&(df_summary['Matches'] > df_summary['Matches'].median()
-    df_summary = df_summary[['Player_FN','team','Tackles','Tackles_per90']].rename(
-        columns={'Player_FN': 'Name', 'Tackles_per90': 'Tackles Per Match','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def inter_90(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg(
-        Matches=('matchid', 'nunique'),  
-        Tackles=('interceptions', 'sum') 
-    ).reset_index()
-    df_summary['Tackles_per90'] = df_summary['Tackles'] / df_summary['Matches']
-    df_summary['Tackles_per90'] = df_summary['Tackles_per90'].round(1)
-    df_summary = df_summary.sort_values(by='Tackles_per90', ascending=False)
-    df_summary = df_summary[(df_summary['Tackles_per90'] != 0) & (df_summary['Matches']>=3)]#&(df_summary['Matches'] > df_summary['Matches'].median())
-    df_summary = df_summary[['Player_FN','team','Tackles','Tackles_per90']].rename(
-        columns={'Player_FN': 'Name', 'Tackles_per90': 'Interceptions Per Match','team':'Team','Tackles':'Interceptions'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def blocks_90(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg(
-        Matches=('matchid', 'nunique'),  
-        Tackles=('blocks', 'sum') 
-    ).reset_index()
-    df_summary['Tackles_per90'] = df_summary['Tackles'] / df_summary['Matches']
-    df_summary['Tackles_per90'] = df_summary['Tackles_per90'].round(1)
-    df_summary = df_summary.sort_values(by='Tackles_per90', ascending=False)
-    df_summary = df_summary[(df_summary['Tackles_per90'] != 0) & (df_summary['Matches']>=3)]#&(df_summary['Matches'] > df_summary['Matches'].median())
-    df_summary = df_summary[['Player_FN','team','Tackles', 'Tackles_per90']].rename(
-        columns={'Player_FN': 'Name', 'Tackles_per90': 'Blocks Per Match','team':'Team','Tackles':'Blocks'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def dfds(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg(
-        Matches=('matchid', 'nunique'),  
-        Tackles=('defender_saves', 'sum') 
-    ).reset_index()
-    df_summary=df_summary[df_summary['Tackles']!=0]
-    df_summary = df_summary.sort_values(by='Tackles', ascending=False)
-    df_summary = df_summary[['Player_FN','team', 'Tackles']].rename(
-        columns={'Player_FN': 'Name', 'Tackles': 'Defender Saves','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def GK_Saves(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df.groupby(['playerid', 'Player_FN', 'team']).agg(
-        Matches=('matchid', 'nunique'),  
-        PSaves=('penalty_saves', 'sum'),
-        Tackles=('saves', 'sum') 
-    ).reset_index()
-    df_summary = df_summary.sort_values(by='Tackles', ascending=False)
-    df_summary = df_summary[df_summary['Tackles'] != 0]
-    df_summary = df_summary[['Player_FN','team', 'PSaves','Tackles']].rename(
-        columns={'Player_FN': 'Name', 'Tackles': 'Saves','team':'Team','PSaves':'Penalty Saves'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def GK_cs(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df[df['position'] == 'GK'].groupby(['playerid', 'Player_FN', 'team']).agg(
-        Matches=('matchid', 'nunique'),  
-        Tackles=('clean_sheets', 'sum')  
-    ).reset_index()
-    df_summary = df_summary.sort_values(by='Tackles', ascending=False)
-    df_summary = df_summary[df_summary['Tackles'] != 0]
-    df_summary = df_summary[['Player_FN','team', 'Tackles']].rename(
-        columns={'Player_FN': 'Name', 'Tackles': 'Clean Sheets','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def savesp(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df[df['position'] == 'GK'].groupby(['playerid', 'Player_FN', 'team']).agg(
-        Saves=('saves', 'sum'),
-        Shots_faced=('shots_faced', 'sum')   
-    ).reset_index()
-
-    df_summary['save%'] = (df_summary['Saves'] / df_summary['Shots_faced']) * 100
-    df_summary['save%'] = df_summary['save%'].fillna(0).round(1)
-    df_summary = df_summary.sort_values(by='save%', ascending=False)
-    df_summary = df_summary[df_summary['Saves'] > df_summary['Saves'].median()]
-    df_summary = df_summary[['Player_FN','team', 'Saves', 'save%']].rename(
-        columns={'Player_FN': 'Name', 'save%': 'Save Percentage','team':'Team'})
-    df_summary['Name'] = df_summary['Name'].str.title()
-    df_summary = df_summary.reset_index(drop=True)
-    return df_summary
-
-def totalgoals(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df['Goals'].sum()
-    df_summary=(int(df_summary))+2
-    return df_summary
-
-def tpp(df: pd.DataFrame) -> pd.DataFrame:
-    df_summary = df['playerid'].nunique()
-    return df_summary
-    
-
-
-
-
-# Dictionary mapping function names to functions and their descriptions
-STAT_FUNCTIONS = {
-    "Goals": {"func": Goals_stats, "desc": "Goal Scored By Players"},
-    "Detailed Goals": {"func": Goalsd_stats, "desc": "Detailed Goal Statistics For Players"},
-    "Detailed Shots Per Match": {"func": shotsd_stats, "desc": "Detailed Shots Statistics For Players"},
-    "Shot Accuracy": {"func": shot_accuracy, "desc": "Shot Accuracy By Players"},
-    "Assists": {"func": Assists_stats, "desc": "Assists By Players"},
-    "Goals + Assists": {"func": GA, "desc": "Goals + Assists By Players"},
-    "Chances Created": {"func": cc, "desc": "Chances Created By Players"},
-    "Tackles Per Match": {"func": tackles_90, "desc": "Tackles Per Match By Players"},
-    "Interceptions Per Match": {"func": inter_90, "desc": "Interceptions Per Match By Players"},
-    "Blocks Per Match": {"func": blocks_90, "desc": "Blocks Per Match By Players"},
-    "Defender Saves": {"func": dfds, "desc": "Total Saves By Defenders"},
-    "Goalkeeper Saves": {"func": GK_Saves, "desc": "Total Saves By Goalkeepers"},
-    "Goalkeeper Clean Sheets": {"func": GK_cs, "desc": "Clean Sheets By Goalkeepers"},
-    "Goalkeeper Save Percentage": {"func": savesp, "desc": "Save Percentage By Goalkeepers"},
-    "Offsides": {"func": offsides_stats, "desc": "Offside Statistics By Players"},
-    "Fouls": {"func": fouls_stats, "desc": "Fouls Committed By Players"},
-    "Yellow Cards": {"func": yc_stats, "desc": "Yellow Cards Received By Players"},
-    "Red Cards": {"func": rc_stats, "desc": "Red Cards Received By Players"}
-    # "Goals By Teams": {"func": Goals_statst, "desc": "Goal Scored By Teams"},
-    # "Shots Stats By Teams": {"func": shotsd_statst, "desc": "Shot Stats By Teams"}
-}
+    totals, match_log = engine.player_profile(index, code)
+
+    st.write(f"**{index['names'][code]}** - {index['teams'][code]}")
+    for column, (label, value) in zip(st.columns(4), [("Matches", totals['Matches']), ("Goals", totals['Goals']),
+                                                       ("Assists", totals['Assists']), ("Shots", totals['shots'])]):
+        column.metric(label=label, value=int(value))
+    st.write("Season totals")
+    st.dataframe(totals.to_frame().T, hide_index=True, use_container_width=True)
+    st.write("Match log")
+    st.dataframe(match_log.drop(columns=['Player_FN', 'player']), hide_index=True, use_container_width=True)
+
+    # Rolling totals over the player's last matches, one point per match played
+    st.write("Form")
+    window = st.number_input("Matches per point", min_value=1, value=DEFAULT_FORM_WINDOW, key="trend_window")
+    engine.record_cache("dataset", lookups=1)
+    trend = engine.form_trend(engine.load_shared_dataset(version)["form"], index['ids'][code], int(window))
+    st.line_chart(trend)
+
+# Function to render the optional performance panel
+def render_perf_panel() -> None:
+    """Show recent stage timings and cache hit/miss counts (process-wide) in the sidebar."""
+    st.sidebar.subheader("Performance")
+    if "engine" not in sys.modules:
+        st.sidebar.caption("Nothing measured yet: the data engine loads with the first leaderboard or player page.")
+        return
+    import pandas as pd
+    state = load_engine().perf_state()
+    with state["lock"]:
+        caches = [
+            {"Cache": name, "Hits": c["lookups"] - c["misses"], "Misses": c["misses"]}
+            for name, c in state["caches"].items()
+        ]
+        stages = list(state["stages"])
+    if caches:
+        st.sidebar.dataframe(pd.DataFrame(caches), hide_index=True, use_container_width=True)
+    if stages:
+        recent = pd.DataFrame(stages[::-1], columns=["at", "stage", "seconds", "rows", "rss_delta_mb"])
+        st.sidebar.dataframe(recent, hide_index=True, use_container_width=True)
 
 # # Main app
 def main():
     st.title("Porkkalam Season 3 Player Statistics")
 
-    # Initialize session state for dataframe if not exists
-    if 'df' not in st.session_state:
-        st.session_state.df = None
-        st.session_state.data_loaded = False
+    # Initialize session state for the selected stat if not exists
+    if 'selected_stat' not in st.session_state:
         st.session_state.selected_stat = None  # Store selected stat
 
-    # Load data 
-    if not st.session_state.data_loaded:
+    # The header and sidebar come from the startup summary; the dataset loads only once a view needs it
+    version = dataset_version()
+    startup = load_startup_summary(version)
+    if startup is None:
+        # No summary for these inputs yet, so build the dataset now (which writes one)
         with st.spinner("Loading data from local files..."):
-            # Fetch and merge CSV files
-            merged_df = fetch_csv_files_local()
-            total_goals=totalgoals(merged_df)
-            tp_p=tpp(merged_df)
-            st.metric(label="Total Goals", value=total_goals)
-            st.metric(label="Total Players Played", value=tp_p)
-            
-            if not merged_df.empty:
-                st.session_state.df = merged_df
-                
-                # Process data similar to original script
-                st.session_state.df['Player_FN'] = st.session_state.df['Player_FN'].fillna(st.session_state.df.get('player', ''))
-                
-                # Fetch team mapping
-                team_mapping = fetch_team_mapping_local()
-                
-                if not team_mapping.empty:
-                    # Perform the merge
-                    st.session_state.df = st.session_state.df.merge(team_mapping, left_on='teamid', right_on='ID', how='left')
-                    st.session_state.df['team'] = st.session_state.df['TeamName']
-                    st.session_state.df = st.session_state.df.drop(columns=['ID', 'TeamName'])
-                else:
-                    st.error("Team mapping could not be loaded, using teamid instead.")
-                
-                st.session_state.data_loaded = True
-            else:
-                st.error("Data loading failed. Check your local directories and file paths.")
+            engine = load_engine()
+            engine.record_cache("dataset", lookups=1)
+            startup = engine.load_shared_dataset(version).get("startup")
+    data_loaded = startup is not None
+    if data_loaded:
+        stats = startup["stats"]
+        st.metric(label="Total Goals", value=startup["metrics"]["total_goals"])
+        st.metric(label="Total Players Played", value=startup["metrics"]["players_played"])
+    else:
+        stats = load_engine().stat_catalog()
+        st.error("Data loading failed. Check your local directories and file paths.")
+
+    # Player profile page or the leaderboards
+    view = st.sidebar.radio("View", ["Leaderboards", "Player profile"])
+    if view == "Player profile":
+        if data_loaded:
+            render_player_page(version)
+    else:
+        # Match-window, team and position filters shared by every leaderboard
+        options = startup["filters"] if data_loaded else None
+        filters = render_filters(options) if options else {"first": None, "last": None, "team": None, "position": None}
 
-    # Sidebar for statistic selection (Using Buttons Instead of Dropdown)
-    st.sidebar.header("Select Stat")
+        # Sidebar for statistic selection (Using Buttons Instead of Dropdown)
+        st.sidebar.header("Select Stat")
     
-    for stat_name in STAT_FUNCTIONS.keys():
-        if st.sidebar.button(stat_name):
-            st.session_state.selected_stat = stat_name
-
-    # Display selected statistic
-    if st.session_state.data_loaded and st.session_state.selected_stat:
-        selected_stat = st.session_state.selected_stat
-        stat_function = STAT_FUNCTIONS[selected_stat]["func"]
-        description = STAT_FUNCTIONS[selected_stat]["desc"]
-        
-        st.subheader(f"{selected_stat} Stats")
-        st.write(description)
+        for stat_name, entry in stats.items():
+            if entry["level"] == "player" and st.sidebar.button(stat_name):
+                st.session_state.selected_stat = stat_name
+
+        st.sidebar.header("Team Stats")
+        for stat_name, entry in stats.items():
+            if entry["level"] == "team" and st.sidebar.button(stat_name):
+                st.session_state.selected_stat = stat_name
+
+        # Form tables count each player's most recent matches inside the match window
+        st.sidebar.header("Form")
+        filters["form_window"] = int(st.sidebar.number_input(
+            "Last matches per player", min_value=1, value=DEFAULT_FORM_WINDOW, key="form_window"))
+        for stat_name, entry in stats.items():
+            if entry["level"] == "form" and st.sidebar.button(stat_name):
+                st.session_state.selected_stat = stat_name
+
+        # Display selected statistic
+        if data_loaded and st.session_state.selected_stat in stats:
+            selected_stat = st.session_state.selected_stat
+            description = stats[selected_stat]["desc"]
         
-        # Apply the selected statistic function
-        try:
-            result_df = stat_function(st.session_state.df.copy())
+            st.subheader(f"{selected_stat} Stats")
+            st.write(description)
+            if stats[selected_stat]["level"] == "form":
+                st.caption(f"Last {filters['form_window']} matches per player; the position filter does not apply.")
         
-            # Display dataframe
-            st.dataframe(
-                result_df,
-                height=500,
-                use_container_width=True,
-                hide_index=True,
-                column_config={col: st.column_config.Column(width="auto") for col in result_df.columns}
-            )
+            # Apply the selected statistic function, one page at a time
+            try:
+                # Precomputed exports when they are current, else the shared dataset (loaded on first use)
+                with st.spinner("Loading statistics..."):
+                    engine = load_engine()
+                    engine.record_cache("exports", lookups=1)
+                    exported = engine.load_exported_leaderboards(version)
+                page_key = f"page:{selected_stat}"
+                page_size = st.session_state.get("page_size", DEFAULT_PAGE_SIZE)
+                page = st.session_state.get(page_key, 1)
+                result_df = engine.fetch_leaderboard_page(selected_stat, version, exported, filters, page_size, (page - 1) * page_size)
+                total_rows = result_df.attrs["total_rows"]
+                pages = max(1, -(-total_rows // page_size))
+                if page > pages:
+                    # Filters shrank the board below the stored page
+                    page = st.session_state[page_key] = pages
+                    result_df = engine.fetch_leaderboard_page(selected_stat, version, exported, filters, page_size, (page - 1) * page_size)
+
+                # Display dataframe
+                with engine.track_stage("render") as record:
+                    st.dataframe(
+                        result_df,
+                        height=35 * (len(result_df) + 1) + 3,
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={col: st.column_config.Column(width="auto") for col in result_df.columns}
+                    )
+                    record["rows"] = len(result_df)
+
+                first_row = (page - 1) * page_size
+                st.caption(f"Rows {min(first_row + 1, total_rows)}-{first_row + len(result_df)} of {total_rows}")
+                page_col, size_col = st.columns(2)
+                page_col.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+                size_col.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key="page_size")
         
-        except Exception as e:
-            st.error(f"Error calculating statistics: {str(e)}")
-    else:
-        st.info("Please Select a Stat.")
+            except Exception as e:
+                st.error(f"Error calculating statistics: {str(e)}")
+        else:
+            st.info("Please Select a Stat.")
+
+    # Optional debug panel with stage timings and cache counters
+    if st.sidebar.checkbox("Show performance panel"):
+        render_perf_panel()
 # Run the main function
 if __name__ == "__main__":
     main()
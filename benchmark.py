@@ -0,0 +1,270 @@
+"""Benchmark the app's data pipeline on synthetic seasons.
+
+Example:
+    python benchmark.py --matches 500 --teams 24 --players 18 --output bench.json
+    python benchmark.py --matches 500 --compare bench.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+import streamlit
+
+# engine.py calls Streamlit at import and while loading; outside `streamlit run` those calls only log warnings
+logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').setLevel(logging.ERROR)
+import datafiles  # noqa: E402
+import engine  # noqa: E402
+
+# Stage log lines would drown the benchmark report
+engine.perf_logger.setLevel(logging.WARNING)
+
+CSV_HEADER = [
+    'team', 'teamid', 'playerid', 'player', 'jersey_no', 'Goals', 'left_goals', 'right_goals',
+    'head_goals', 'penalty_goals', 'Assists', 'KeyPasses', 'chances_created', 'big_chances',
+    'shots_on_target', 'shots_off_target', 'shots', 'post', 'blocked_shots', 'fouls', 'yellow_cards',
+    'red_cards', 'defender_saves', 'offsides', 'tackles', 'interceptions', 'blocks', 'saves',
+    'penalty_saves', 'position', 'clean_sheets', 'shots_faced', 'matchid', 'Player_FN',
+]
+OUTFIELD_POSITIONS = ['Defense', 'Midfield', 'Forward']
+SQUAD_SIZE = 11
+REGRESSION_THRESHOLD = 1.25
+
+# Function to generate a synthetic season in the csvfiles layout
+def generate_season(out_dir: str, matches: int, teams: int, players: int, seed: int = 0) -> None:
+    """Write <matchid>.csv files and a team mapping workbook matching the real schema."""
+    rng = np.random.default_rng(seed)
+    csv_dir = os.path.join(out_dir, 'csvfiles')
+    os.makedirs(csv_dir, exist_ok=True)
+    os.makedirs(os.path.join(out_dir, 'impfiles'), exist_ok=True)
+
+    # Every team has one goalkeeper per eleven players and a fixed roster
+    rosters = []
+    for team in range(1, teams + 1):
+        roster = []
+        for slot in range(players):
+            player_no = (team - 1) * players + slot + 1
+            position = 'GK' if slot % SQUAD_SIZE == 0 else OUTFIELD_POSITIONS[slot % len(OUTFIELD_POSITIONS)]
+            roster.append((f"SYN{player_no:06d}", f"P{player_no}", f"Player {player_no} Synthetic", position))
+        rosters.append(roster)
+
+    for matchid in range(1, matches + 1):
+        home, away = rng.choice(teams, size=2, replace=False)
+        rows = []
+        for team in (home, away):
+            squad = [rosters[team][0]] + [rosters[team][i] for i in rng.choice(
+                np.arange(1, players), size=min(SQUAD_SIZE, players) - 1, replace=False)]
+            for playerid, player, full_name, position in squad:
+                is_gk = position == 'GK'
+                left, right, head = rng.poisson(0.08, 3)
+                goals = int(left + right + head)
+                on_target = goals + int(rng.poisson(0.4))
+                off_target = int(rng.poisson(0.5))
+                saves = int(rng.poisson(4)) if is_gk else 0
+                rows.append({
+                    'team': f"Team {team + 1}", 'teamid': team + 1, 'playerid': playerid,
+                    'player': player, 'jersey_no': int(rng.integers(1, 99)), 'Goals': goals,
+                    'left_goals': int(left), 'right_goals': int(right), 'head_goals': int(head),
+                    'penalty_goals': int(rng.random() < 0.01), 'Assists': int(rng.poisson(0.1)),
+                    'KeyPasses': int(rng.poisson(0.6)), 'chances_created': int(rng.poisson(0.5)),
+                    'big_chances': int(rng.poisson(0.1)), 'shots_on_target': on_target,
+                    'shots_off_target': off_target, 'shots': on_target + off_target,
+                    'post': int(rng.random() < 0.03), 'blocked_shots': int(rng.poisson(0.1)),
+                    'fouls': int(rng.poisson(0.4)), 'yellow_cards': int(rng.random() < 0.05),
+                    'red_cards': int(rng.random() < 0.005), 'defender_saves': int(rng.random() < 0.02),
+                    'offsides': int(rng.poisson(0.1)), 'tackles': int(rng.poisson(1.0)),
+                    'interceptions': int(rng.poisson(0.8)), 'blocks': int(rng.poisson(0.3)),
+                    'saves': saves, 'penalty_saves': int(is_gk and rng.random() < 0.03),
+                    'position': position, 'clean_sheets': int(is_gk and rng.random() < 0.25),
+                    'shots_faced': saves + int(rng.poisson(1)) if is_gk else 0,
+                    'matchid': matchid, 'Player_FN': full_name,
+                })
+        pd.DataFrame(rows, columns=CSV_HEADER).to_csv(
+            os.path.join(csv_dir, f"{matchid}.csv"), index=False, encoding='ISO-8859-1')
+
+    mapping = pd.DataFrame({
+        'ID': range(1, teams + 1),
+        'TeamName': [f"Synthetic Team {team} FC" for team in range(1, teams + 1)],
+        'ShortName': [f"ST{team}" for team in range(1, teams + 1)],
+    })
+    mapping.to_excel(os.path.join(out_dir, 'impfiles', 'Team IDs.xlsx'), index=False)
+
+# Function to point the app's file locations at a data directory
+def use_data_dir(data_dir: str) -> None:
+    """Redirect the CSV, team mapping, snapshot, quarantine and export locations of datafiles.py and engine.py into data_dir."""
+    # engine.py imports the input locations from datafiles.py, so both modules hold a copy;
+    # snapshot files are resolved from datafiles.SNAPSHOT_DIR alone
+    for module in (datafiles, engine):
+        module.CSV_DIR = os.path.join(data_dir, 'csvfiles')
+        module.TEAM_MAPPING_FILE = os.path.join(data_dir, 'impfiles', 'Team IDs.xlsx')
+    datafiles.EXCEL_DIR = os.path.join(data_dir, 'impfiles')
+    datafiles.SNAPSHOT_DIR = os.path.join(data_dir, '.snapshot')
+    engine.QUARANTINE_DIR = os.path.join(data_dir, 'quarantine')
+    engine.EXPORT_DIR = os.path.join(data_dir, 'exports')
+
+# Function to time one stage
+def measure(func: Callable[[], Any], repeat: int, setup: Callable[[], None] = lambda: None) -> Dict[str, Any]:
+    """Run func `repeat` times, reporting wall times and the peak traced memory of the first run."""
+    times = []
+    peak = 0
+    for run in range(repeat):
+        setup()
+        if run == 0:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+        if run == 0:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    rows = len(result) if hasattr(result, '__len__') else None
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "peak_mb": peak / 1e6,
+        "rows": rows,
+    }
+
+# Function to benchmark every pipeline stage
+def run_benchmark(data_dir: str, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Time ingestion, team mapping, aggregation, match windows, team rollups, form windows, the player index, snapshot and startup loads and every STAT_FUNCTIONS entry."""
+    use_data_dir(data_dir)
+    results = {}
+    results["csv_ingest"] = measure(engine.fetch_csv_files_local, repeat)
+    results["csv_ingest:serial"] = measure(lambda: engine.fetch_csv_files_local(workers=1), repeat)
+    for executor in ("thread", "process"):
+        results[f"csv_ingest:{executor}"] = measure(
+            lambda: engine.fetch_csv_files_local(executor=executor, workers=max(2, engine.INGEST_WORKERS)), repeat)
+    # Ingest that also folds every chunk into the player-match sums the aggregate and match log start from
+    results["csv_ingest:fold"] = measure(lambda: engine.fetch_csv_files_local(matches=[]), repeat)
+    raw = engine.fetch_csv_files_local()
+    results["team_mapping_read"] = measure(lambda: engine.build_team_lookup(engine.fetch_team_mapping_local()), repeat)
+    lookup = engine.build_team_lookup(engine.fetch_team_mapping_local())
+    results["team_merge"] = measure(lambda: engine.join_team_names(raw.copy(), lookup), repeat)
+    season = engine.compact_categories(engine.join_team_names(raw.copy(), lookup))
+    results["player_match_sums"] = measure(lambda: engine.player_match_sums(season), repeat)
+    matches = engine.player_match_sums(season)
+    results["aggregate_players"] = measure(lambda: engine.aggregate_players(matches), repeat)
+    players = engine.aggregate_players(matches)
+    results["player_summary"] = measure(lambda: engine.build_player_summary(players), repeat)
+    summary = engine.build_player_summary(players)
+    results["match_partials"] = measure(lambda: engine.build_match_partials(season, engine.PLAYER_KEYS + ['position']), repeat)
+    partials = {
+        "player": engine.build_match_partials(season, engine.PLAYER_KEYS),
+        "position": engine.build_match_partials(season, engine.PLAYER_KEYS + ['position']),
+    }
+    matchids = sorted(int(m) for m in season['matchid'].unique())
+    half = matchids[len(matchids) // 2]
+    results["window_summary"] = measure(lambda: engine.build_window_summary(partials, half, matchids[-1]), repeat)
+    team_matches = engine.build_team_matches(partials["player"])
+    team_counts = engine.team_match_counts(team_matches, matchids[0], matchids[-1])
+    results["team_summary"] = measure(lambda: engine.build_team_summary(summary, team_counts), repeat)
+    results["match_log"] = measure(lambda: engine.build_match_log(matches), repeat)
+    # A new match file continues the running totals of the players in it, without re-sorting the log
+    newest = matches['matchid'] == matchids[-1]
+    earlier_log = engine.build_match_log(matches[~newest])
+    results["update_match_log"] = measure(
+        lambda: engine.update_match_log(earlier_log, matches[newest], matches.iloc[:0]), repeat)
+    form = engine.build_form_index(engine.build_match_log(matches))
+    results["form_summary"] = measure(lambda: engine.form_totals(form, matchids[0], matchids[-1], engine.FORM_WINDOW), repeat)
+    summaries = {
+        "player": summary,
+        "team": engine.build_team_summary(summary, team_counts),
+        "form": engine.form_totals(form, matchids[0], matchids[-1], engine.FORM_WINDOW),
+    }
+    results["player_index"] = measure(lambda: engine.build_player_index(season)["ids"], repeat)
+    index = engine.build_player_index(season)
+    results["player_search"] = measure(lambda: engine.search_players(index, "player 1"), repeat)
+
+    clear_snapshot = lambda: shutil.rmtree(datafiles.SNAPSHOT_DIR, ignore_errors=True)
+    results["load_cold"] = measure(lambda: engine.load_season_data()[0], repeat, setup=clear_snapshot)
+    results["load_snapshot"] = measure(lambda: engine.load_season_data()[0], repeat)
+    # What the app reads before its first render
+    metrics = {"total_goals": int(engine.totalgoals(season)), "players_played": int(engine.tpp(season))}
+    engine.save_startup(datafiles.dataset_version(), metrics, engine.filter_options(season))
+    results["startup_summary"] = measure(lambda: datafiles.load_startup_summary(datafiles.dataset_version()), repeat)
+
+    for stat_name, entry in engine.STAT_FUNCTIONS.items():
+        results[f"stat:{stat_name}"] = measure(lambda: entry["func"](summaries[entry["level"]]), repeat)
+    results["stat_pages:top20"] = measure(
+        lambda: [entry["func"](summaries[entry["level"]], limit=20) for entry in engine.STAT_FUNCTIONS.values()], repeat)
+    return results
+
+# Function to compare two result files
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print per-stage ratios against a baseline run and return the stages that regressed."""
+    regressions = []
+    for stage, result in current["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or previous["min_s"] <= 0:
+            continue
+        ratio = result["min_s"] / previous["min_s"]
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{stage:45s} {previous['min_s'] * 1e3:10.2f} ms -> {result['min_s'] * 1e3:10.2f} ms  x{ratio:5.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(stage)
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Porkkalam stats pipeline on a synthetic season.")
+    parser.add_argument("--matches", type=int, default=80, help="number of match files to generate")
+    parser.add_argument("--teams", type=int, default=18, help="number of teams")
+    parser.add_argument("--players", type=int, default=22, help="roster size per team")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the generator")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown ratio reported as a regression")
+    parser.add_argument("--data-dir", help="keep the generated season in this directory instead of a temp dir")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="porkkalam-bench-")
+    try:
+        start = time.perf_counter()
+        generate_season(data_dir, args.matches, args.teams, args.players, args.seed)
+        print(f"Generated {args.matches} matches in {time.perf_counter() - start:.1f}s at {data_dir}")
+        stages = run_benchmark(data_dir, args.repeat)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        "config": {key: getattr(args, key) for key in ("matches", "teams", "players", "seed", "repeat")},
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "streamlit": streamlit.__version__,
+            "machine": platform.machine(),
+        },
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": stages,
+    }
+    for stage, result in stages.items():
+        print(f"{stage:45s} {result['min_s'] * 1e3:10.2f} ms  peak {result['peak_mb']:8.2f} MB  rows {result['rows']}")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("Warning: comparing runs with different configurations.")
+        if compare_results(report, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Input file locations, their version tag and the startup summary.
+
+Imports nothing heavy, so the app can render its first screen before pandas or the engine load.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# Local directory information
+CSV_DIR = "csvfiles"  # Directory containing CSV files
+EXCEL_DIR = "impfiles"  # Directory containing Excel files
+TEAM_MAPPING_FILE = os.path.join(EXCEL_DIR, "Team IDs.xlsx")
+SNAPSHOT_DIR = ".snapshot"
+
+# Header metrics, filter options and the stat list, written whenever the full dataset is built
+STARTUP_FILE = "startup.json"
+ENGINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "engine.py")
+
+# Function to list match CSV files in the local directory
+def list_csv_files() -> List[str]:
+    """Return the names of all CSV files in the csvfiles directory, in matchid order."""
+    return sorted((f for f in os.listdir(CSV_DIR) if f.lower().endswith('.csv')), key=match_file_key)
+
+# Function to order match files by the matchid in their name
+def match_file_key(file_name: str) -> Tuple[int, int, str]:
+    """Sort <matchid>.csv files numerically, followed by any other names alphabetically."""
+    stem = os.path.splitext(file_name)[0]
+    return (0, int(stem), file_name) if stem.isdigit() else (1, 0, file_name)
+
+# Function to locate a file in the snapshot directory
+def snapshot_path(file_name: str = "") -> str:
+    """Join file_name onto SNAPSHOT_DIR when called, so redirecting SNAPSHOT_DIR moves every snapshot file."""
+    return os.path.join(SNAPSHOT_DIR, file_name)
+
+# Function to tag the current state of the input files
+def dataset_version() -> str:
+    """Cheap version tag of the inputs, from the size and mtime of every CSV and the team mapping."""
+    paths = [os.path.join(CSV_DIR, f) for f in list_csv_files()] if os.path.exists(CSV_DIR) else []
+    entries = []
+    for path in paths + [TEAM_MAPPING_FILE]:
+        try:
+            stat = os.stat(path)
+            entries.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+        except OSError:
+            entries.append(f"{path}:missing")
+    return hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()[:16]
+
+# Function to tag the engine code the startup summary was written by
+def engine_version() -> str:
+    """Size and mtime of engine.py, so new or changed leaderboards invalidate the stat list."""
+    try:
+        stat = os.stat(ENGINE_FILE)
+    except OSError:
+        return "missing"
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+# Function to read the startup summary
+def load_startup_summary(version: str) -> Optional[Dict[str, Any]]:
+    """The summary written for this dataset version and engine, or None if it is missing or stale."""
+    try:
+        with open(snapshot_path(STARTUP_FILE), encoding="utf-8") as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if summary.get("version") != version or summary.get("engine") != engine_version():
+        return None
+    return summary
+
+# Function to write the startup summary
+def save_startup_summary(version: str, metrics: Dict[str, int], filters: Dict[str, List[Any]],
+                         stats: Dict[str, Dict[str, str]]) -> None:
+    """Write the summary atomically so a concurrent reader never sees half of it."""
+    summary = {"version": version, "engine": engine_version(), "metrics": metrics, "filters": filters, "stats": stats}
+    path = snapshot_path(STARTUP_FILE)
+    os.makedirs(snapshot_path(), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(summary, f)
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,1770 @@
+"""Season data engine: ingest, snapshot, per-player aggregates, leaderboards and the shared caches.
+
+Imported lazily by app.py (pandas and numpy load with it) and directly by the command-line scripts.
+"""
+import streamlit as st
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import os
+import json
+import time
+import logging
+import functools
+import threading
+import contextlib
+import hashlib
+import codecs
+import csv
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Callable, Any, Optional, Tuple, Iterator
+
+from datafiles import (
+    CSV_DIR, TEAM_MAPPING_FILE,
+    engine_version, list_csv_files, match_file_key, save_startup_summary, snapshot_path,
+)
+
+# Persisted snapshot of the merged season frame (parquet) and its source fingerprints;
+# file names inside the snapshot directory, resolved with snapshot_path
+SNAPSHOT_FILE = "season.parquet"
+SNAPSHOT_MANIFEST = "manifest.json"
+PLAYERS_FILE = "players.parquet"
+MATCH_LOG_FILE = "match_log.parquet"
+SNAPSHOT_VERSION = 6
+
+# Declared ingest schema for match CSVs; columns outside it are dropped at read time
+CATEGORY_COLUMNS = ['team', 'playerid', 'player', 'position', 'Player_FN']
+DROPPED_COLUMNS = ['jersey_no']
+COUNT_DTYPE = 'uint8'
+
+# Per-player aggregate store: one row per player key and GK flag with running sums
+PLAYER_KEYS = ['playerid', 'Player_FN', 'team']
+COUNT_COLUMNS = [
+    'Goals', 'left_goals', 'right_goals', 'head_goals', 'penalty_goals', 'Assists',
+    'KeyPasses', 'chances_created', 'big_chances', 'shots_on_target', 'shots_off_target',
+    'shots', 'post', 'blocked_shots', 'fouls', 'yellow_cards', 'red_cards', 'defender_saves',
+    'offsides', 'tackles', 'interceptions', 'blocks', 'saves', 'penalty_saves',
+    'clean_sheets', 'shots_faced',
+]
+INGEST_SCHEMA = {
+    **{column: 'category' for column in CATEGORY_COLUMNS},
+    'teamid': 'uint16',
+    'matchid': 'uint16',
+    **{column: COUNT_DTYPE for column in COUNT_COLUMNS},
+}
+
+# Streaming ingest: rows read per chunk, and where rows that cannot be typed are set aside
+CSV_CHUNK_ROWS = 50000
+NA_VALUES = {'', '#N/A', '#N/A N/A', '#NA', '-NaN', '-nan', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+NA_LIST = sorted(NA_VALUES)
+QUARANTINE_DIR = "quarantine"
+STORE_CATEGORY_COLUMNS = CATEGORY_COLUMNS + ['source_file', 'ShortName']
+STORE_MERGE_CHUNKS = 64
+
+# Form tables and trend charts: default number of a player's most recent matches, and the charted series.
+# The match log keeps running totals of every counting column, and of the same columns over goalkeeper
+# appearances only (GK_ columns, as in the player summary)
+FORM_WINDOW = 5
+LOG_COLUMNS = COUNT_COLUMNS + ['GK_Matches'] + ['GK_' + column for column in COUNT_COLUMNS]
+FORM_TREND_COLUMNS = {
+    "Goals + Assists": ['Goals', 'Assists'],
+    "Shots": ['shots'],
+    "Tackles": ['tackles'],
+    "Saves": ['saves'],
+}
+
+# Parallel parsing: "thread" or "process" pool, and files below which parsing stays in the calling thread.
+# Arrow parses and types each chunk without the GIL, so threads use every core and hand each file over
+# chunk by chunk. Processes are spawned (seconds of start-up) and return whole files, so they are opt-in,
+# e.g. fetch_csv_files_local(executor="process") from a script
+INGEST_EXECUTOR = "thread"
+INGEST_WORKERS = os.cpu_count() or 1
+INGEST_PARALLEL_MIN_FILES = 16
+
+# Performance instrumentation: recent stage records and cache counters, logged as JSON lines
+PERF_LOG_ENTRIES = 200
+perf_logger = logging.getLogger("porkkalam.perf")
+if not perf_logger.handlers:
+    _perf_handler = logging.StreamHandler()
+    _perf_handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    perf_logger.addHandler(_perf_handler)
+    perf_logger.setLevel(logging.INFO)
+    perf_logger.propagate = False
+
+# Function to hold the process-wide performance records
+@st.cache_resource(show_spinner=False)
+def perf_state() -> Dict[str, Any]:
+    """Recent stage records and cache counters, shared by every session in this process."""
+    return {"stages": deque(maxlen=PERF_LOG_ENTRIES), "caches": {}, "lock": threading.Lock()}
+
+# Function to read the resident memory of this process
+def current_rss_mb() -> Optional[float]:
+    """Resident set size in MB, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError):
+        return None
+
+# Function to time a pipeline stage
+@contextlib.contextmanager
+def track_stage(stage: str) -> Iterator[Dict[str, Any]]:
+    """Record the duration, row count (set by the caller) and memory delta of a stage."""
+    record: Dict[str, Any] = {"stage": stage, "rows": None}
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = round(time.perf_counter() - start, 6)
+        rss_after = current_rss_mb()
+        record["rss_delta_mb"] = None if rss_before is None or rss_after is None else round(rss_after - rss_before, 2)
+        record["at"] = time.strftime("%H:%M:%S")
+        perf_state()["stages"].append(record)
+        perf_logger.info(json.dumps(record))
+
+# Decorator to time every call of a loading function
+def timed_stage(stage: str) -> Callable:
+    """Wrap a function in track_stage, taking the row count from the frame it returns."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_stage(stage) as record:
+                result = func(*args, **kwargs)
+                frame = result[0] if isinstance(result, tuple) else result
+                if isinstance(frame, pd.DataFrame):
+                    record["rows"] = len(frame)
+                return result
+        return wrapper
+    return decorator
+
+# Function to count cache lookups and misses
+def record_cache(cache: str, lookups: int = 0, misses: int = 0) -> None:
+    """Add to the lookup and miss counters of a named cache."""
+    state = perf_state()
+    with state["lock"]:
+        counters = state["caches"].setdefault(cache, {"lookups": 0, "misses": 0})
+        counters["lookups"] += lookups
+        counters["misses"] += misses
+
+# Function to pick the text encoding of a CSV file
+def detect_encoding(file_path: str) -> str:
+    """Return UTF-8 (BOM allowed) when the whole file decodes as UTF-8, else ISO-8859-1; reads in blocks."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(file_path, 'rb') as f:
+        try:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                decoder.decode(block)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return 'ISO-8859-1'
+    return 'utf-8-sig'
+
+# Function to group a CSV reader's record batches into tables of at least n_rows rows
+def read_tables(reader: pa_csv.CSVStreamingReader, n_rows: int) -> Iterator[pa.Table]:
+    """Yield the batches of reader in order, combined into single-chunk tables of n_rows rows or more (the last may be smaller)."""
+    batches, rows = [], 0
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= n_rows:
+            yield pa.Table.from_batches(batches).combine_chunks()
+            batches, rows = [], 0
+    if rows:
+        yield pa.Table.from_batches(batches).combine_chunks()
+
+# Function to type a column of integer text with Arrow
+def parse_integers(values: pa.Array, dtype: str, blank_as_zero: bool) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """Values as dtype with malformed cells set to 0, the mask of malformed cells, and the mask of NA cells read as 0.
+
+    NA cells are read as 0 only with blank_as_zero, and are only looked for once a plain cast has failed
+    (the blank mask is None until then).
+    """
+    blank = None
+    try:
+        parsed = pc.cast(values, pa.int64()).to_numpy()
+    except pa.ArrowInvalid:
+        if blank_as_zero:
+            blank = pc.is_in(values, value_set=pa.array(NA_LIST))
+            values = pc.if_else(blank, '0', values)
+            blank = blank.to_numpy(zero_copy_only=False)
+        try:
+            parsed = pc.cast(values, pa.int64()).to_numpy()
+        except pa.ArrowInvalid:
+            # Only columns that do not parse as integers (including values beyond int64) are checked value by value
+            parsed = pd.to_numeric(values.to_numpy(zero_copy_only=False), errors='coerce').astype(float)
+    limits = np.iinfo(dtype)
+    with np.errstate(invalid='ignore'):
+        malformed = np.isnan(parsed) | (parsed < limits.min) | (parsed > limits.max) | (parsed % 1 != 0)
+    return np.where(malformed, 0, parsed).astype(dtype), malformed, blank
+
+# Function to read one match CSV in chunks typed with the declared ingest schema
+def iter_match_chunks(file_path: str, quarantine: List[pd.DataFrame], notices: List[str]) -> Iterator[Dict[str, np.ndarray]]:
+    """Yield typed column arrays per chunk of a match CSV; rows that cannot be typed go to quarantine instead.
+
+    Arrow's C reader splits the text and the columns are typed with Arrow kernels, all outside the GIL,
+    so files parse in parallel in a thread pool. Blank counting cells are read as 0 (and counted in a
+    notice), as the summed leaderboards always treated them.
+    """
+    encoding = detect_encoding(file_path)
+    with open(file_path, newline='', encoding=encoding) as f:
+        header = next(csv.reader(f), None)
+    if header is None:
+        raise ValueError("empty file")
+    unknown = [c for c in header if c not in INGEST_SCHEMA and c not in DROPPED_COLUMNS]
+    missing = [c for c in INGEST_SCHEMA if c not in header]
+    if unknown:
+        notices.append(f"ignoring unknown columns {', '.join(unknown)}")
+    if missing:
+        raise ValueError(f"missing columns {', '.join(missing)}")
+    positions = {column: header.index(column) for column in INGEST_SCHEMA}
+
+    # Lines with the wrong number of fields cannot be lined up with the header. Every such line is remembered,
+    # so the other rows can be numbered like lines after the header; blank lines are then dropped silently
+    skipped, rejected = [], []
+
+    def invalid_row(row: pa_csv.InvalidRow) -> str:
+        # row.number counts physical lines from the header, which is line 1
+        skipped.append(row.number - 1)
+        if row.text:
+            rejected.append((row.number - 1, row.text))
+        return 'skip'
+
+    def quarantine_rejected() -> None:
+        if rejected:
+            numbers, lines = zip(*rejected)
+            quarantine.append(pd.DataFrame({'row': list(numbers), 'line': list(lines), 'reason': 'wrong field count'}))
+            rejected.clear()
+
+    reader = pa_csv.open_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(skip_rows=1, column_names=header,
+                                        encoding='utf8' if encoding == 'utf-8-sig' else encoding),
+        parse_options=pa_csv.ParseOptions(invalid_row_handler=invalid_row, ignore_empty_lines=False),
+        convert_options=pa_csv.ConvertOptions(column_types={column: pa.string() for column in header}),
+    )
+    blanks = dict.fromkeys(COUNT_COLUMNS, 0)
+    n_kept = 0
+    for table in read_tables(reader, CSV_CHUNK_ROWS):
+        quarantine_rejected()
+        # The k-th kept row is line k plus the skipped lines that come before it
+        ordinals = np.arange(n_kept + 1, n_kept + table.num_rows + 1)
+        n_kept += table.num_rows
+        skipped_at = np.asarray(skipped, dtype=np.int64)
+        numbers = ordinals + np.searchsorted(skipped_at - np.arange(len(skipped_at)), ordinals, side='right')
+        # Arrow reads a blank line as a row of empty fields
+        empty = pc.equal(table.column(0), '')
+        if pc.any(empty).as_py():
+            for column in table.columns[1:]:
+                empty = pc.and_(empty, pc.equal(column, ''))
+            empty = empty.to_numpy(zero_copy_only=False)
+            table, numbers = table.filter(pa.array(~empty)), numbers[~empty]
+            if not table.num_rows:
+                continue
+
+        # The counting columns are typed together, one row of counts per column
+        shape = (len(COUNT_COLUMNS), table.num_rows)
+        counts = pa.concat_arrays([table.column(positions[column]).combine_chunks() for column in COUNT_COLUMNS])
+        counts, counts_malformed, blank = parse_integers(counts, COUNT_DTYPE, True)
+        counts, counts_malformed = counts.reshape(shape), counts_malformed.reshape(shape)
+        if blank is not None:
+            for column, n_blank in zip(COUNT_COLUMNS, blank.reshape(shape).sum(axis=1)):
+                blanks[column] += int(n_blank)
+
+        columns, bad, reasons = {}, np.zeros(table.num_rows, dtype=bool), np.full(table.num_rows, '', dtype=object)
+        for column, dtype in INGEST_SCHEMA.items():
+            if dtype == 'category':
+                # Missing values are looked up once per distinct name, which then maps back to every row
+                encoded = table.column(positions[column]).combine_chunks().dictionary_encode()
+                names = encoded.dictionary.to_numpy(zero_copy_only=False)
+                names = np.append(np.where(np.isin(names, NA_LIST), np.nan, names), np.nan)
+                columns[column] = names[encoded.indices.to_numpy()]
+                continue
+            if column in COUNT_COLUMNS:
+                i = COUNT_COLUMNS.index(column)
+                columns[column], malformed = counts[i], counts_malformed[i]
+            else:
+                columns[column], malformed, _ = parse_integers(table.column(positions[column]).combine_chunks(), dtype, False)
+            reasons[malformed & ~bad] = f"malformed {column}"
+            bad |= malformed
+        missing_id = pd.isna(columns['playerid'])
+        reasons[missing_id & ~bad] = 'missing playerid'
+        bad |= missing_id
+
+        if bad.any():
+            rejected_rows = table.filter(pa.array(bad)).to_pandas()
+            quarantine.append(rejected_rows.assign(row=numbers[bad], reason=reasons[bad]))
+            columns = {column: values[~bad] for column, values in columns.items()}
+        yield columns
+
+    quarantine_rejected()
+    blank_counts = [f"{count} {column}" for column, count in blanks.items() if count]
+    if blank_counts:
+        notices.append(f"blank counting cells read as 0 ({', '.join(blank_counts)})")
+
+# Function to start the parse result of one match file
+def new_parse_result(file_path: str) -> Dict[str, Any]:
+    """Chunks, quarantined rows, notices and the error (if any) of one file."""
+    return {"path": file_path, "chunks": [], "quarantine": [], "notices": [], "error": None}
+
+# Function to read one match file's chunks without raising
+def read_match_chunks(result: Dict[str, Any]) -> Iterator[Dict[str, np.ndarray]]:
+    """Yield the typed chunks of result["path"]; an error ends the file and is kept in result["error"]."""
+    try:
+        yield from iter_match_chunks(result["path"], result["quarantine"], result["notices"])
+    except Exception as e:
+        result["error"] = str(e)
+
+# Function to parse one match file in a process worker
+def parse_match_file(file_path: str) -> Dict[str, Any]:
+    """Read one CSV into a list of typed chunks; errors, notices and quarantined rows are returned for the caller to show."""
+    result = new_parse_result(file_path)
+    result["chunks"] = list(read_match_chunks(result))
+    return result
+
+# Function to map over items in a worker pool, yielding results in input order
+def ordered_map(func: Callable[[Any], Any], items: List[Any], executor: str, workers: int) -> Iterator[Any]:
+    """Run func over items in a process or thread pool with at most 2 * workers results held; 1 worker runs inline.
+
+    Process workers are spawned, never forked, so a multi-threaded caller such as the Streamlit server is safe.
+    """
+    if workers <= 1:
+        yield from map(func, items)
+        return
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+    with pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# Function to parse match files in a worker pool, in input order
+def stream_match_files(paths: List[str], executor: str, workers: int) -> Iterator[Dict[str, Any]]:
+    """Yield one parse result per path in order; its notices, quarantine and error are final once its chunks are consumed.
+
+    Process workers return whole files, as a generator cannot cross processes. Inline and in a thread
+    pool, "chunks" is an iterator: the pool reads one chunk ahead for each of the next 2 * workers files,
+    so at most that many parsed chunks wait in memory.
+    """
+    if executor == "process" and workers > 1:
+        yield from ordered_map(parse_match_file, paths, executor, workers)
+        return
+    results = [new_parse_result(path) for path in paths]
+    readers = [read_match_chunks(result) for result in results]
+    if workers <= 1:
+        for result, reader in zip(results, readers):
+            result["chunks"] = reader
+            yield result
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Only one next() per file is ever in flight, so no reader runs in two threads at once
+        pending = {}
+
+        def follow(i: int) -> Iterator[Dict[str, np.ndarray]]:
+            try:
+                while True:
+                    chunk = pending[i].result()
+                    if chunk is None:
+                        break
+                    pending[i] = pool.submit(next, readers[i], None)
+                    yield chunk
+            finally:
+                # A consumer that stops early leaves a read in flight; wait for it before closing the file
+                pending.pop(i).result()
+                readers[i].close()
+
+        for i, result in enumerate(results):
+            for j in range(i, min(i + 2 * workers, len(paths))):
+                if j not in pending:
+                    pending[j] = pool.submit(next, readers[j], None)
+            result["chunks"] = follow(i)
+            yield result
+
+# Function to write and report the rows set aside while reading a file
+def report_quarantine(file_name: str, quarantine: List[pd.DataFrame]) -> None:
+    """Write quarantined rows to QUARANTINE_DIR/<file_name> and warn, or clear the file's earlier report."""
+    path = os.path.join(QUARANTINE_DIR, file_name)
+    if not quarantine:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    rows = pd.concat(quarantine, ignore_index=True)
+    os.makedirs(QUARANTINE_DIR, exist_ok=True)
+    rows.to_csv(path, index=False)
+    reasons = ', '.join(f"{count} {reason}" for reason, count in rows['reason'].value_counts().items())
+    st.warning(f"{file_name}: {len(rows)} row(s) quarantined ({reasons}), see {path}")
+
+# Function to start an empty columnar store for streamed chunks
+def new_column_store() -> Dict[str, Any]:
+    """Per-column lists of compact arrays, and per-column category tables for the name columns."""
+    return {"chunks": {}, "categories": {column: {} for column in STORE_CATEGORY_COLUMNS}, "rows": 0}
+
+# Function to append a chunk to the columnar store
+def store_append(store: Dict[str, Any], chunk: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Keep each column as a compact array; name columns become int32 codes into the store's category tables.
+
+    Returns the arrays as stored, so later steps can read the chunk without decoding the whole store.
+    """
+    stored = {}
+    for column, values in chunk.items():
+        if column in store["categories"]:
+            table = store["categories"][column]
+            codes, uniques = pd.factorize(values)
+            remap = np.fromiter((table.setdefault(value, len(table)) for value in uniques), dtype=np.int32, count=len(uniques))
+            # Missing names have code -1, which picks the trailing -1
+            values = np.append(remap, np.int32(-1))[codes]
+        else:
+            values = np.asarray(values)
+        chunks = store["chunks"].setdefault(column, [])
+        chunks.append(values)
+        stored[column] = values
+        # Many small files would otherwise leave one tiny array per file and column
+        if len(chunks) >= STORE_MERGE_CHUNKS:
+            chunks[:] = [np.concatenate(chunks)]
+    store["rows"] += len(values)
+    return stored
+
+# Function to drop the rows appended after a point
+def store_truncate(store: Dict[str, Any], n_rows: int) -> None:
+    """Forget every row after the first n_rows, e.g. the part of a file that failed midway."""
+    for chunks in store["chunks"].values():
+        chunks[:] = [np.concatenate(chunks)[:n_rows]]
+    store["rows"] = n_rows
+
+# Function to turn the columnar store into the season frame
+def store_frame(store: Dict[str, Any]) -> pd.DataFrame:
+    """Concatenate one column at a time, freeing its chunks, with name columns as sorted categoricals."""
+    columns = {}
+    for column in list(store["chunks"]):
+        values = np.concatenate(store["chunks"].pop(column))
+        if column in store["categories"]:
+            categories = np.array(list(store["categories"][column]), dtype=object)
+            order = np.argsort(categories)
+            rank = np.empty(len(order) + 1, dtype=np.int32)
+            rank[order] = np.arange(len(order), dtype=np.int32)
+            rank[-1] = -1
+            values = pd.Categorical.from_codes(rank[values], categories[order]).remove_unused_categories()
+        columns[column] = values
+    return pd.DataFrame(columns)
+
+# Function to fold stored chunks into player-match sums
+def fold_stored_chunks(store: Dict[str, Any], chunks: List[Dict[str, np.ndarray]]) -> pd.DataFrame:
+    """Sum chunks returned by store_append per player key, GK flag and matchid, decoding only the key columns."""
+    columns = {}
+    valid = np.ones(sum(len(chunk['matchid']) for chunk in chunks), dtype=bool)
+    for key in PLAYER_KEYS:
+        codes = np.concatenate([chunk[key] for chunk in chunks])
+        valid &= codes >= 0
+        # Missing names have code -1, which picks the trailing None
+        columns[key] = np.append(np.array(list(store["categories"][key]), dtype=object), None)[codes]
+    gk = store["categories"]["position"].get('GK', -2)
+    columns['gk'] = np.concatenate([chunk['position'] for chunk in chunks]) == gk
+    for column in ['matchid'] + COUNT_COLUMNS:
+        columns[column] = np.concatenate([chunk[column] for chunk in chunks])
+    return player_match_sums(pd.DataFrame(columns)[valid])
+
+# Function to store name columns of an assembled season frame as categoricals
+def compact_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert the name columns (and source/short-name columns when present) to categoricals."""
+    for column in STORE_CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object).astype('category')
+    return df
+
+# Function to fetch all CSV files from local directory
+@timed_stage("fetch_csv_files_local")
+def fetch_csv_files_local(file_names: Optional[List[str]] = None, lookup: Optional[Dict[str, Any]] = None,
+                          executor: Optional[str] = None, workers: Optional[int] = None,
+                          matches: Optional[List[pd.DataFrame]] = None) -> pd.DataFrame:
+    """Parse CSV files (all of them by default) across a worker pool into one compact season frame.
+
+    Files are stored in matchid order whatever order the workers finish in. With a team lookup each
+    chunk is joined to team names before it is stored. Peak memory is the compact store plus one
+    parsed chunk per file in flight (two files per worker); a process pool holds whole files instead.
+
+    When a matches list is given, the stored chunks are also folded into player-match sums as they
+    stream in (about CSV_CHUNK_ROWS rows at a time, once their file has been read in full), and the
+    merged sums are appended to it, so the player aggregate and match log need no pass over the frame.
+    """
+    try:
+        # Check if directory exists
+        if not os.path.exists(CSV_DIR):
+            st.error(f"Directory {CSV_DIR} not found.")
+            return pd.DataFrame()
+        
+        # Get all CSV files in the directory
+        csv_files = list_csv_files() if file_names is None else sorted(file_names, key=match_file_key)
+        
+        if not csv_files:
+            st.error(f"No CSV files found in {CSV_DIR} directory.")
+            return pd.DataFrame()
+        
+        executor = executor or INGEST_EXECUTOR
+        workers = INGEST_WORKERS if workers is None else workers
+        if len(csv_files) < INGEST_PARALLEL_MIN_FILES:
+            workers = 1
+
+        # Parse in the pool and stream each file's chunks into the columnar store in order
+        store = new_column_store()
+        n_rows = 0
+        # Stored chunks of finished files waiting to be folded, and the sums folded so far
+        pending, sums = [], []
+        paths = [os.path.join(CSV_DIR, file_name) for file_name in csv_files]
+        with st.spinner(f"Loading {len(csv_files)} match file(s)..."):
+            for file_name, result in zip(csv_files, stream_match_files(paths, executor, workers)):
+                stored = []
+                try:
+                    for chunk in result["chunks"]:
+                        chunk['source_file'] = np.full(len(chunk['matchid']), file_name, dtype=object)
+                        if lookup is not None:
+                            join_team_names(chunk, lookup)
+                        stored.append(store_append(store, chunk))
+                except Exception as e:
+                    result["error"] = str(e)
+                for notice in result["notices"]:
+                    st.warning(f"{file_name}: {notice}")
+                if result["error"] is not None:
+                    # A file that fails midway contributes nothing
+                    if store["rows"] > n_rows:
+                        store_truncate(store, n_rows)
+                    st.warning(f"Error reading {file_name}: {result['error']}")
+                    continue
+                n_rows = store["rows"]
+                report_quarantine(file_name, result["quarantine"])
+                if matches is not None:
+                    pending.extend(stored)
+                    if sum(len(chunk['matchid']) for chunk in pending) >= CSV_CHUNK_ROWS:
+                        sums.append(fold_stored_chunks(store, pending))
+                        pending = []
+                    if len(sums) >= STORE_MERGE_CHUNKS:
+                        sums = [player_match_sums(pd.concat(sums, ignore_index=True))]
+        
+        if n_rows:
+            if matches is not None:
+                if pending:
+                    sums.append(fold_stored_chunks(store, pending))
+                matches.append(sums[0] if len(sums) == 1 else player_match_sums(pd.concat(sums, ignore_index=True)))
+            return store_frame(store)
+        else:
+            st.error("Failed to load any CSV files.")
+            return pd.DataFrame()
+            
+    except Exception as e:
+        st.error(f"Error accessing local directory: {str(e)}")
+        return pd.DataFrame()
+
+# Function to fetch team mapping from local file
+@timed_stage("fetch_team_mapping_local")
+def fetch_team_mapping_local() -> pd.DataFrame:
+    """Fetch team mapping Excel file from local directory."""
+    try:
+        with st.spinner(f"Loading team mapping file..."):
+            # Check if file exists
+            if not os.path.exists(TEAM_MAPPING_FILE):
+                st.error(f"Team mapping file not found at {TEAM_MAPPING_FILE}")
+                return pd.DataFrame()
+            
+            # Read Excel file
+            team_mapping = pd.read_excel(TEAM_MAPPING_FILE)
+            # st.success("Team mapping loaded successfully")
+            return team_mapping
+            
+    except Exception as e:
+        st.error(f"Error fetching team mapping file: {str(e)}")
+        return pd.DataFrame()
+
+# Function to turn the team mapping into a teamid lookup
+def build_team_lookup(team_mapping: pd.DataFrame) -> Dict[str, Any]:
+    """Index mapping rows by teamid and factorize each mapped column into codes plus categories."""
+    if team_mapping.empty:
+        return {}
+    ids = team_mapping['ID'].to_numpy(dtype=np.int64)
+    rows = np.full(int(ids.max(initial=0)) + 1, -1, dtype=np.int64)
+    # Assigned last-to-first so a duplicated ID resolves to its first mapping row
+    rows[ids[::-1]] = np.arange(len(ids))[::-1]
+    columns = {}
+    for column in team_mapping.columns.drop('ID'):
+        codes, categories = pd.factorize(team_mapping[column].astype(object), sort=True)
+        columns[column] = (codes, pd.Index(categories, dtype=object))
+    return {"rows": rows, "columns": columns}
+
+# Function to load the team mapping lookup once per file version
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_team_lookup(mtime_ns: int) -> Dict[str, Any]:
+    """Parse the team mapping workbook and build its lookup; cached on the file's modification time."""
+    record_cache("team_mapping", misses=1)
+    return build_team_lookup(fetch_team_mapping_local())
+
+# Function to fill player names and join team names from the mapping
+def join_team_names(df: pd.DataFrame, lookup: Dict[str, Any]) -> pd.DataFrame:
+    """Fill missing full names and replace the CSV team with the mapped team name, column by column.
+
+    Also works on a dict of column arrays, which is how streamed chunks are joined.
+    """
+    df['Player_FN'] = np.where(pd.isna(df['Player_FN']), df.get('player', ''), df['Player_FN'])
+    if not lookup:
+        return df
+    teamids = np.asarray(df['teamid']).astype(np.int64)
+    table = lookup["rows"]
+    rows = table[np.clip(teamids, 0, len(table) - 1)]
+    rows[(teamids < 0) | (teamids >= len(table))] = -1
+    unmapped = rows < 0
+    for column, (codes, categories) in lookup["columns"].items():
+        if column != 'TeamName':
+            df[column] = pd.Categorical.from_codes(np.where(unmapped, -1, codes[rows]), categories)
+
+    # Unmapped teamids keep the CSV team name rather than dropping out of every leaderboard
+    codes, teams = lookup["columns"]['TeamName']
+    team_codes = np.where(unmapped, -1, codes[rows])
+    if unmapped.any():
+        st.warning(f"No team mapping for teamid(s) {sorted(set(teamids[unmapped].tolist()))}, "
+                   f"using the team name from the CSV for {int(unmapped.sum())} row(s)")
+        csv_teams = np.asarray(df['team'], dtype=object)[unmapped]
+        teams = teams.append(pd.Index(pd.unique(csv_teams), dtype=object).difference(teams).dropna())
+        team_codes[unmapped] = teams.get_indexer(csv_teams)
+    df['team'] = pd.Categorical.from_codes(team_codes, teams)
+    return df
+
+# Function to fingerprint a source file for the snapshot manifest
+def file_fingerprint(file_path: str, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return size/mtime/hash of a file, reusing the previous hash if size and mtime are unchanged."""
+    stat = os.stat(file_path)
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime_ns:
+        fingerprint["hash"] = previous["hash"]
+    else:
+        with open(file_path, "rb") as f:
+            fingerprint["hash"] = hashlib.sha256(f.read()).hexdigest()
+    return fingerprint
+
+def same_content(current: Optional[Dict[str, Any]], previous: Optional[Dict[str, Any]]) -> bool:
+    """Whether two fingerprints describe the same file content (both missing counts as equal)."""
+    if current is None or previous is None:
+        return current is previous
+    return current["hash"] == previous.get("hash")
+
+# Function to map rows to dense group codes
+def factorize_rows(df: pd.DataFrame, keys: List[str]) -> Tuple[np.ndarray, np.ndarray, Dict[str, pd.Index]]:
+    """Return per-row group codes ordered like df.groupby(keys), a mask of rows with no missing key, and the group keys."""
+    combined = np.zeros(len(df), dtype=np.int64)
+    valid = np.ones(len(df), dtype=bool)
+    labels = []
+    for key in keys:
+        codes, uniques = pd.factorize(df[key], sort=True)
+        valid &= codes >= 0
+        combined = combined * max(len(uniques), 1) + codes
+        labels.append(uniques)
+    groups, inverse = np.unique(combined[valid], return_inverse=True)
+    # Decode the mixed-radix group codes back into one key value per group
+    group_keys = {}
+    for key, uniques in reversed(list(zip(keys, labels))):
+        radix = max(len(uniques), 1)
+        group_keys[key] = pd.Index(uniques).take(groups % radix)
+        groups = groups // radix
+    return inverse.reshape(-1), valid, {key: group_keys[key] for key in keys}
+
+# Function to sum match rows per player and match
+def player_match_sums(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per player key, GK flag and matchid with every counting column summed, ordered by those keys.
+
+    Takes raw match rows, or earlier sums (which carry a gk column instead of position) to merge them.
+    """
+    if 'gk' not in df.columns:
+        df = df.assign(gk=df['position'] == 'GK')
+    keys = PLAYER_KEYS + ['gk', 'matchid']
+    codes, valid, group_keys = factorize_rows(df, keys)
+    n_groups = len(group_keys['matchid'])
+    # Plain string keys keep the sums independent of any frame's category sets
+    columns = {key: group_keys[key].to_numpy(dtype=object) for key in PLAYER_KEYS}
+    columns['gk'] = group_keys['gk'].to_numpy(dtype=bool)
+    columns['matchid'] = group_keys['matchid'].to_numpy().astype(np.int64)
+    for column in COUNT_COLUMNS:
+        columns[column] = np.bincount(codes, weights=df[column].to_numpy()[valid], minlength=n_groups).astype(np.int64)
+    return pd.DataFrame(columns)
+
+# Function to aggregate player-match sums per player
+@timed_stage("aggregate_players")
+def aggregate_players(matches: pd.DataFrame) -> pd.DataFrame:
+    """Sum every counting column and count matches per player key and GK flag, from player_match_sums rows."""
+    keys = PLAYER_KEYS + ['gk']
+    codes, valid, group_keys = factorize_rows(matches, keys)
+    n_groups = len(group_keys['gk'])
+    sums = {
+        column: np.bincount(codes, weights=matches[column].to_numpy()[valid], minlength=n_groups).astype(np.int64)
+        for column in COUNT_COLUMNS
+    }
+    # Each row is a distinct match of its group
+    sums['Matches'] = np.bincount(codes, minlength=n_groups).astype(np.int64)
+    index = pd.MultiIndex.from_arrays(
+        [group_keys[key].astype(object) if key in PLAYER_KEYS else group_keys[key].astype(bool) for key in keys],
+        names=keys,
+    )
+    return pd.DataFrame(sums, index=index)
+
+# Function to fold match files into the aggregate store
+@timed_stage("update_player_aggregate")
+def update_player_aggregate(players: pd.DataFrame, added: pd.DataFrame, removed: pd.DataFrame) -> pd.DataFrame:
+    """Add the player-match sums of new match files and subtract those of replaced ones, touching only affected players."""
+    players = players.copy()
+    if not removed.empty:
+        delta = aggregate_players(removed)
+        players.loc[delta.index] -= delta
+        players = players[players['Matches'] > 0]
+    if not added.empty:
+        delta = aggregate_players(added)
+        existing = delta.index.intersection(players.index)
+        players.loc[existing] += delta.loc[existing]
+        players = pd.concat([players, delta.drop(existing)])
+    return players
+
+# Function to collapse player-match sums into match log rows
+def aggregate_player_matches(matches: pd.DataFrame) -> pd.DataFrame:
+    """One row per player key and matchid with the LOG_COLUMNS summed, sorted by player key then matchid."""
+    codes, valid, group_keys = factorize_rows(matches, PLAYER_KEYS + ['matchid'])
+    n_groups = len(group_keys['matchid'])
+    gk = matches['gk'].to_numpy(dtype=bool)[valid]
+    sums = {}
+    for column in COUNT_COLUMNS:
+        values = matches[column].to_numpy()[valid].astype(np.int64)
+        sums[column] = np.bincount(codes, weights=values, minlength=n_groups)
+        sums['GK_' + column] = np.bincount(codes, weights=np.where(gk, values, 0), minlength=n_groups)
+    sums['GK_Matches'] = np.bincount(codes, weights=gk, minlength=n_groups) > 0
+    keys = pd.DataFrame({key: group_keys[key].astype(object) for key in PLAYER_KEYS})
+    keys['matchid'] = group_keys['matchid'].to_numpy().astype(np.int64)
+    return log_frame(keys, np.column_stack([sums[column] for column in LOG_COLUMNS]).astype(np.int64))
+
+# Function to find where each player's rows start in a player-then-matchid ordered frame
+def player_bounds(frame: pd.DataFrame) -> np.ndarray:
+    """Row offsets of every player key's first row, followed by the row count."""
+    changed = np.zeros(len(frame), dtype=bool)
+    if len(frame):
+        changed[0] = True
+    for key in PLAYER_KEYS:
+        values = frame[key].to_numpy(dtype=object)
+        changed[1:] |= values[1:] != values[:-1]
+    return np.append(np.flatnonzero(changed), len(frame))
+
+# Function to assemble match log rows in one step
+def log_frame(keys: pd.DataFrame, values: np.ndarray, appearance: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """Player keys and matchid from keys, then Appearance (if given) and one LOG_COLUMNS column per column of values."""
+    columns = {column: keys[column].to_numpy() for column in PLAYER_KEYS + ['matchid']}
+    if appearance is not None:
+        columns['Appearance'] = appearance
+    columns.update(zip(LOG_COLUMNS, values.T))
+    return pd.DataFrame(columns)
+
+# Function to find where each player's rows start in the match log
+def log_bounds(log: pd.DataFrame) -> np.ndarray:
+    """Like player_bounds, but from the appearance numbers, which restart at 1 on every player's first row."""
+    return np.append(np.flatnonzero(log['Appearance'].to_numpy() == 1), len(log))
+
+# Function to turn per-match sums into per-player running totals
+def running_totals(per_match: pd.DataFrame, carried: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Replace each counting column with the player's total up to and including that match, and number the appearances.
+
+    carried holds one earlier log row per per_match row; totals and appearance numbers continue from it.
+    """
+    bounds = player_bounds(per_match)
+    starts = np.repeat(bounds[:-1], np.diff(bounds))
+    cum = np.vstack([np.zeros((1, len(LOG_COLUMNS)), dtype=np.int64),
+                     np.cumsum(per_match[LOG_COLUMNS].to_numpy(dtype=np.int64), axis=0)])
+    running = cum[1:] - cum[starts]
+    appearance = np.arange(len(per_match), dtype=np.int64) - starts + 1
+    if carried is not None:
+        running += carried[LOG_COLUMNS].to_numpy(dtype=np.int64)
+        appearance += carried['Appearance'].to_numpy(dtype=np.int64)
+    return log_frame(per_match, running, appearance)
+
+# Function to turn running totals back into per-match sums
+def per_match_values(log: pd.DataFrame) -> pd.DataFrame:
+    """Inverse of running_totals: each row minus the same player's previous row."""
+    bounds = log_bounds(log)
+    running = log[LOG_COLUMNS].to_numpy(dtype=np.int64)
+    values = running.copy()
+    values[1:] -= running[:-1]
+    values[bounds[:-1]] = running[bounds[:-1]]
+    return log_frame(log, values)
+
+# Function to build the match log behind the form tables and trend charts
+@timed_stage("match_log")
+def build_match_log(matches: pd.DataFrame) -> pd.DataFrame:
+    """Per-player running totals after every match, ordered by player key then matchid, from player_match_sums rows."""
+    return running_totals(aggregate_player_matches(matches))
+
+# Function to key player blocks for binary search
+def player_sort_keys(frame: pd.DataFrame, rows: np.ndarray) -> np.ndarray:
+    """One string per row that sorts like its (playerid, Player_FN, team) tuple; NUL sorts before any other character."""
+    columns = [frame[key].take(rows).to_numpy(dtype=object) for key in PLAYER_KEYS]
+    return np.array(['\0'.join(values) for values in zip(*columns)], dtype=object)
+
+# Function to fold match files into the match log
+@timed_stage("update_match_log")
+def update_match_log(log: pd.DataFrame, added: pd.DataFrame, removed: pd.DataFrame) -> pd.DataFrame:
+    """Splice the matches of new files into each touched player's rows and drop those of replaced files.
+
+    added and removed are the player_match_sums rows of those files. A new match normally comes after the player's last one, so its running totals continue from that
+    row. Only players who lost a match or gained an earlier one are recomputed. Untouched rows keep
+    their place; nothing but the new and recomputed rows is sorted.
+    """
+    fresh = aggregate_player_matches(added) if not added.empty else None
+    removed_ids = removed['matchid'].unique() if not removed.empty else []
+    if log.empty:
+        return running_totals(fresh) if fresh is not None else log
+    if fresh is None and not len(removed_ids):
+        return log
+    bounds = log_bounds(log)
+    starts, ends = bounds[:-1], bounds[1:]
+    group_keys = player_sort_keys(log, starts)
+    group_of_row = np.repeat(np.arange(len(starts)), np.diff(bounds))
+
+    # Players with a removed match are recomputed from their per-match values
+    dropped = np.isin(log['matchid'].to_numpy(), removed_ids)
+    redo = np.zeros(len(starts), dtype=bool)
+    redo[group_of_row[dropped]] = True
+    inserted = []
+    if fresh is not None:
+        fresh_bounds = player_bounds(fresh)
+        fresh_group = np.repeat(np.arange(len(fresh_bounds) - 1), np.diff(fresh_bounds))
+        # The player each new block belongs to, or the one it goes in front of
+        slot = np.searchsorted(group_keys, player_sort_keys(fresh, fresh_bounds[:-1]))
+        existing = group_keys[np.minimum(slot, len(starts) - 1)] == player_sort_keys(fresh, fresh_bounds[:-1])
+        existing &= slot < len(starts)
+        target = np.minimum(slot, len(starts) - 1)
+        after_last = fresh['matchid'].to_numpy()[fresh_bounds[:-1]] > log['matchid'].to_numpy()[ends[target] - 1]
+        append = existing & after_last & ~redo[target]
+        redo[target[existing & ~append]] = True
+
+        # Appended matches continue from the player's last running totals
+        rows = append[fresh_group]
+        if rows.any():
+            appended = running_totals(fresh[rows], carried=log.iloc[ends[target[fresh_group[rows]]] - 1])
+            appended['position'] = ends[target[fresh_group[rows]]]
+            inserted.append(appended)
+
+        # New players go in front of the first player whose key sorts after theirs
+        rows = ~existing[fresh_group]
+        if rows.any():
+            new_players = running_totals(fresh[rows])
+            new_players['position'] = bounds[slot[fresh_group[rows]]]
+            inserted.append(new_players)
+
+    # Recomputed players replace their old rows
+    redo_rows = redo[group_of_row]
+    if redo.any():
+        history = per_match_values(log[redo_rows])
+        history = history[~dropped[redo_rows]]
+        if fresh is not None:
+            history = pd.concat([history, fresh[(existing & redo[target])[fresh_group]]])
+        history = history.sort_values(PLAYER_KEYS + ['matchid'], kind='stable')
+        recomputed = running_totals(history)
+        recomputed['position'] = starts[np.searchsorted(group_keys, player_sort_keys(recomputed, np.arange(len(recomputed))))]
+        inserted.append(recomputed)
+
+    # Inserted rows in player-key order line up with their positions among the kept rows;
+    # empty pieces are left out, as they would turn the string key columns into objects
+    kept = np.flatnonzero(~redo_rows)
+    inserted = [frame for frame in inserted if len(frame)]
+    if not inserted:
+        return log.iloc[kept].reset_index(drop=True)
+    inserted = pd.concat(inserted, ignore_index=True).sort_values(PLAYER_KEYS + ['matchid'], kind='stable')
+    positions = inserted.pop('position').to_numpy()
+    removed_before = np.concatenate([[0], np.cumsum(redo_rows)])
+    order = np.insert(kept, positions - removed_before[positions], len(log) + np.arange(len(inserted)))
+    return pd.concat([log, inserted], ignore_index=True).take(order).reset_index(drop=True)
+
+# Function to materialize the per-player summary shared by every leaderboard
+@timed_stage("player_summary")
+def build_player_summary(players: pd.DataFrame) -> pd.DataFrame:
+    """Collapse the aggregate store to one row per player, with GK-appearance totals in GK_ columns."""
+    summary = players.groupby(level=PLAYER_KEYS).sum()
+    gk = players[players.index.get_level_values('gk')].droplevel('gk')
+    summary = summary.join(gk.add_prefix('GK_')).fillna(0).astype('int64')
+    return summary
+
+# Function to build per-match partial aggregates for match-window queries
+def build_match_partials(season: pd.DataFrame, keys: List[str]) -> Dict[str, Any]:
+    """Sum rows per (keys, matchid) in group-then-matchid order, with running totals over all partial rows."""
+    codes, valid, group_keys = factorize_rows(season, keys + ['matchid'])
+    n_rows = len(group_keys['matchid'])
+    sums = np.column_stack([
+        np.bincount(codes, weights=season[column].to_numpy()[valid], minlength=n_rows)
+        for column in COUNT_COLUMNS
+    ]).astype(np.int64)
+    # Partial rows of one group are contiguous and in matchid order, so a window is a slice of each group
+    group_codes, groups = pd.MultiIndex.from_arrays([group_keys[key].astype(object) for key in keys]).factorize()
+    groups = groups.set_names(keys)
+    matchids = group_keys['matchid'].to_numpy().astype(np.int64)
+    radix = int(matchids.max(initial=0)) + 1
+    return {
+        "index": groups,
+        "radix": radix,
+        "row_keys": group_codes.astype(np.int64) * radix + matchids,
+        "cum": np.vstack([np.zeros((1, len(COUNT_COLUMNS)), dtype=np.int64), np.cumsum(sums, axis=0)]),
+    }
+
+# Function to total a contiguous match window from the partial aggregates
+def window_totals(partials: Dict[str, Any], first: int, last: int) -> pd.DataFrame:
+    """Sum every group's partial rows with first <= matchid <= last as a difference of two running totals."""
+    first, last = max(int(first), 0), min(int(last), partials["radix"] - 1)
+    offsets = np.arange(len(partials["index"]), dtype=np.int64) * partials["radix"]
+    lo = np.searchsorted(partials["row_keys"], offsets + first, side='left')
+    hi = np.searchsorted(partials["row_keys"], offsets + last, side='right')
+    totals = pd.DataFrame(partials["cum"][hi] - partials["cum"][lo], index=partials["index"], columns=COUNT_COLUMNS)
+    # One partial row per group and match, so the slice length is the match count
+    totals['Matches'] = (hi - lo).astype(np.int64)
+    return totals[totals['Matches'] > 0]
+
+# Function to build the player summary for a match window and position
+def build_window_summary(partials: Dict[str, Dict[str, Any]], first: int, last: int, position: Optional[str] = None) -> pd.DataFrame:
+    """Same shape as build_player_summary, counting only matches in [first, last] and rows at the given position."""
+    by_position = window_totals(partials["position"], first, last)
+    positions = by_position.index.get_level_values('position')
+    if position is None:
+        summary = window_totals(partials["player"], first, last)
+    else:
+        summary = by_position[positions == position].droplevel('position')
+    gk = by_position[positions == 'GK'].droplevel('position') if position in (None, 'GK') else summary.iloc[:0]
+    return summary.join(gk.add_prefix('GK_')).fillna(0).astype('int64')
+
+# Function to index the distinct matches each team played
+def build_team_matches(partials: Dict[str, Any]) -> Dict[str, Any]:
+    """Sorted distinct (team, matchid) keys, read off the per-player partial rows instead of the raw rows."""
+    radix = partials["radix"]
+    team_codes, teams = pd.factorize(partials["index"].get_level_values('team'), sort=True)
+    row_keys = partials["row_keys"]
+    return {
+        "teams": pd.Index(teams, name='team'),
+        "radix": radix,
+        "keys": np.unique(team_codes[row_keys // radix].astype(np.int64) * radix + row_keys % radix),
+    }
+
+# Function to count each team's matches in a match window
+def team_match_counts(team_matches: Dict[str, Any], first: int, last: int) -> pd.Series:
+    """Distinct matches per team with first <= matchid <= last, one pair of binary searches per team."""
+    first, last = max(int(first), 0), min(int(last), team_matches["radix"] - 1)
+    offsets = np.arange(len(team_matches["teams"]), dtype=np.int64) * team_matches["radix"]
+    lo = np.searchsorted(team_matches["keys"], offsets + first, side='left')
+    hi = np.searchsorted(team_matches["keys"], offsets + last, side='right')
+    return pd.Series(hi - lo, index=team_matches["teams"], name='Matches')
+
+# Function to index the match log for form windows
+def build_form_index(match_log: pd.DataFrame) -> Dict[str, Any]:
+    """Player groups, their row ranges and player-then-matchid search keys over the match log's running totals."""
+    bounds = log_bounds(match_log)
+    group_codes = np.repeat(np.arange(len(bounds) - 1, dtype=np.int64), np.diff(bounds))
+    matchids = match_log['matchid'].to_numpy().astype(np.int64)
+    radix = int(matchids.max(initial=0)) + 1
+    groups = match_log[PLAYER_KEYS].iloc[bounds[:-1]].astype(object)
+    return {
+        "index": pd.MultiIndex.from_frame(groups, names=PLAYER_KEYS),
+        "bounds": bounds,
+        "radix": radix,
+        "row_keys": group_codes * radix + matchids,
+        "running": match_log[LOG_COLUMNS].to_numpy(dtype=np.int64),
+    }
+
+# Function to total each player's last matches inside a match window
+def form_totals(form: Dict[str, Any], first: int, last: int, window: int) -> pd.DataFrame:
+    """Sum every player's last `window` matches with first <= matchid <= last as a difference of two running totals."""
+    first, last = max(int(first), 0), min(int(last), form["radix"] - 1)
+    offsets = np.arange(len(form["index"]), dtype=np.int64) * form["radix"]
+    lo = np.searchsorted(form["row_keys"], offsets + first, side='left')
+    hi = np.searchsorted(form["row_keys"], offsets + last, side='right')
+    lo = np.maximum(lo, hi - int(window))
+    # Running totals restart at each player's first row, so nothing is subtracted there
+    running = form["running"]
+    at_last = np.where((hi > lo)[:, None], running[np.maximum(hi - 1, 0)], 0) if len(running) else running[:0]
+    before = np.where((lo > form["bounds"][:-1])[:, None], running[np.maximum(lo - 1, 0)], 0) if len(running) else running[:0]
+    totals = pd.DataFrame(at_last - before, index=form["index"], columns=LOG_COLUMNS)
+    totals.insert(0, 'Matches', (hi - lo).astype(np.int64))
+    return totals[totals['Matches'] > 0]
+
+# Function to build one player's rolling form series
+def form_trend(form: Dict[str, Any], playerid: str, window: int) -> pd.DataFrame:
+    """Per matchid, the player's FORM_TREND_COLUMNS totals over their last `window` matches up to that one."""
+    groups = np.flatnonzero(form["index"].get_level_values('playerid') == playerid)
+    bounds = form["bounds"]
+    rows = np.concatenate([np.arange(bounds[g], bounds[g + 1]) for g in groups]) if len(groups) else np.arange(0)
+    # Back from running totals to per-match values, then merge a player's rows for several teams by matchid
+    values = form["running"][rows].copy()
+    values[1:] -= form["running"][rows[:-1]]
+    starts = np.isin(rows, bounds[groups])
+    values[starts] = form["running"][rows[starts]]
+    matchids, inverse = np.unique(form["row_keys"][rows] % form["radix"], return_inverse=True)
+    per_match = np.zeros((len(matchids), len(LOG_COLUMNS)), dtype=np.int64)
+    np.add.at(per_match, inverse.reshape(-1), values)
+    cum = np.vstack([np.zeros((1, len(LOG_COLUMNS)), dtype=np.int64), np.cumsum(per_match, axis=0)])
+    ends = np.arange(1, len(matchids) + 1)
+    rolling = cum[ends] - cum[np.maximum(ends - int(window), 0)]
+    return pd.DataFrame(
+        {label: rolling[:, [LOG_COLUMNS.index(column) for column in columns]].sum(axis=1)
+         for label, columns in FORM_TREND_COLUMNS.items()},
+        index=pd.Index(matchids, name='matchid'),
+    )
+
+# Function to roll the player summary up to one row per team
+def build_team_summary(summary: pd.DataFrame, team_matches: pd.Series) -> pd.DataFrame:
+    """Sum every player column per team; Matches comes from the team's distinct matches, not the player sum."""
+    teams = summary.drop(columns=['Matches', 'GK_Matches']).groupby(level='team').sum()
+    teams.insert(0, 'Matches', team_matches.reindex(teams.index, fill_value=0).to_numpy(dtype=np.int64))
+    return teams
+
+# Function to build the player index over a playerid-sorted, match-ordered store
+def build_player_index(season: pd.DataFrame) -> Dict[str, Any]:
+    """Sort rows by playerid then matchid, record each player's row range and totals, and index name prefixes."""
+    codes, ids = pd.factorize(season['playerid'].astype(object), sort=True)
+    order = np.lexsort((season['matchid'].to_numpy(), codes))
+    order = order[codes[order] >= 0]
+    player_codes = codes[order]
+    store = season.iloc[order][['matchid', 'team', 'position', 'Player_FN', 'player'] + COUNT_COLUMNS].reset_index(drop=True)
+    bounds = np.searchsorted(player_codes, np.arange(len(ids) + 1))
+
+    # Every player has at least one row, so each range is non-empty
+    sums = store[COUNT_COLUMNS].to_numpy(dtype=np.int64)
+    totals = pd.DataFrame(np.add.reduceat(sums, bounds[:-1], axis=0) if len(ids) else sums[:0], columns=COUNT_COLUMNS)
+    matchids = store['matchid'].to_numpy().astype(np.int64)
+    radix = int(matchids.max(initial=0)) + 1
+    totals.insert(0, 'Matches', np.bincount(np.unique(player_codes * radix + matchids) // radix, minlength=len(ids)))
+
+    # Names and teams per player, and every lower-cased name and name word pointing back at its player
+    names = pd.DataFrame({
+        'code': np.concatenate([player_codes, player_codes]),
+        'name': np.concatenate([store['Player_FN'].to_numpy(dtype=object), store['player'].to_numpy(dtype=object)]),
+    }).dropna()
+    names = names.assign(name=names['name'].astype(str).str.strip()).drop_duplicates()
+    teams = pd.DataFrame({'code': player_codes, 'team': store['team'].to_numpy(dtype=object)}).dropna().drop_duplicates()
+    prefixes = sorted({
+        (token, code)
+        for code, name in zip(names['code'], names['name'].str.lower())
+        for token in [name] + name.split()
+    })
+    return {
+        "ids": ids,
+        "codes": {playerid: code for code, playerid in enumerate(ids)},
+        "bounds": bounds,
+        "store": store,
+        "totals": totals,
+        "names": names.groupby('code')['name'].first().str.title().reindex(range(len(ids)), fill_value='').to_numpy(),
+        "teams": teams.groupby('code')['team'].agg(', '.join).reindex(range(len(ids)), fill_value='').to_numpy(),
+        "prefix_keys": np.array([token for token, _ in prefixes], dtype=object),
+        "prefix_codes": np.array([code for _, code in prefixes], dtype=np.int64),
+    }
+
+# Function to search the player index by name prefix or playerid
+def search_players(index: Dict[str, Any], query: str, limit: int = 50) -> List[int]:
+    """Return player codes whose name or any name word starts with the query, or whose playerid equals it."""
+    query = query.strip()
+    found = [index["codes"][query]] if query in index["codes"] else []
+    prefix = query.lower()
+    if prefix:
+        lo = np.searchsorted(index["prefix_keys"], prefix, side='left')
+        hi = np.searchsorted(index["prefix_keys"], prefix + '\U0010ffff', side='left')
+        found += np.unique(index["prefix_codes"][lo:hi]).tolist()
+    found = list(dict.fromkeys(found))
+    return sorted(found, key=lambda code: index["names"][code])[:limit]
+
+# Function to look up one player's season totals and match log
+def player_profile(index: Dict[str, Any], code: int) -> Tuple[pd.Series, pd.DataFrame]:
+    """Season totals and the match-ordered rows of one player, by slicing their row range."""
+    start, end = index["bounds"][code], index["bounds"][code + 1]
+    return index["totals"].iloc[code], index["store"].iloc[start:end].reset_index(drop=True)
+
+# Function to load the persisted season snapshot
+@timed_stage("snapshot_read")
+def load_snapshot() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
+    """Load the snapshot frame, player aggregate, match log and manifest, or empty frames if there is no usable snapshot."""
+    try:
+        with open(snapshot_path(SNAPSHOT_MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), {}
+        snapshot = pd.read_parquet(snapshot_path(SNAPSHOT_FILE))
+        # The manifest is written after the data, so a row mismatch means an interrupted write
+        if len(snapshot) != manifest.get("rows"):
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), {}
+        try:
+            players = pd.read_parquet(snapshot_path(PLAYERS_FILE))
+            match_log = pd.read_parquet(snapshot_path(MATCH_LOG_FILE))
+        except Exception:
+            players, match_log = pd.DataFrame(), pd.DataFrame()
+        return snapshot, players, match_log, manifest
+    except Exception:
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), {}
+
+# Function to persist the season snapshot
+@timed_stage("snapshot_write")
+def save_snapshot(df: pd.DataFrame, players: pd.DataFrame, match_log: pd.DataFrame, manifest: Dict[str, Any],
+                  write_data: bool = True) -> None:
+    """Write the snapshot frame, player aggregate, match log and manifest, replacing the previous ones atomically."""
+    try:
+        os.makedirs(snapshot_path(), exist_ok=True)
+        files = [(df, SNAPSHOT_FILE, False), (players, PLAYERS_FILE, True), (match_log, MATCH_LOG_FILE, False)]
+        if write_data:
+            for frame, file_name, index in files:
+                frame.to_parquet(snapshot_path(file_name) + ".tmp", index=index)
+            for frame, file_name, index in files:
+                os.replace(snapshot_path(file_name) + ".tmp", snapshot_path(file_name))
+        manifest_path = snapshot_path(SNAPSHOT_MANIFEST)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+    except Exception as e:
+        st.warning(f"Could not write data snapshot: {str(e)}")
+
+# Function to load the merged, team-joined season frame
+@timed_stage("load_season_data")
+def load_season_data() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Load the season frame, player aggregate and match log, re-parsing only CSV files changed since the last snapshot."""
+    if not os.path.exists(CSV_DIR):
+        st.error(f"Directory {CSV_DIR} not found.")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    csv_files = list_csv_files()
+    if not csv_files:
+        st.error(f"No CSV files found in {CSV_DIR} directory.")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+
+    snapshot, players, match_log, manifest = load_snapshot()
+    previous = manifest.get("files", {})
+    files = {name: file_fingerprint(os.path.join(CSV_DIR, name), previous.get(name)) for name in csv_files}
+    team_mapping_fp = None
+    if os.path.exists(TEAM_MAPPING_FILE):
+        team_mapping_fp = file_fingerprint(TEAM_MAPPING_FILE, manifest.get("team_mapping"))
+
+    # A new team mapping changes every row, so it invalidates the whole snapshot
+    if snapshot.empty or not same_content(team_mapping_fp, manifest.get("team_mapping")):
+        snapshot, players, match_log, previous = pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), {}
+    changed = [name for name in csv_files if not same_content(files[name], previous.get(name))]
+    record_cache("snapshot_files", lookups=len(csv_files), misses=len(changed))
+    stale = set(changed) | (set(previous) - set(files))
+    for name in files:
+        if name not in changed:
+            files[name]["matchids"] = previous[name].get("matchids", [])
+
+    season, removed, fresh, added = snapshot, pd.DataFrame(), pd.DataFrame(), []
+    if stale and not snapshot.empty:
+        is_stale = snapshot['source_file'].isin(stale)
+        season, removed = snapshot[~is_stale], snapshot[is_stale]
+    if changed:
+        lookup = {}
+        if team_mapping_fp is not None:
+            record_cache("team_mapping", lookups=1)
+            lookup = load_team_lookup(team_mapping_fp["mtime"])
+        fresh = fetch_csv_files_local(changed, lookup, matches=added)
+        # Files that failed to parse stay out of the manifest so they are retried next time
+        matchids = fresh.groupby('source_file')['matchid'].unique() if not fresh.empty else {}
+        files = {name: fp for name, fp in files.items() if name not in changed or name in matchids}
+        for name in changed:
+            if name in matchids:
+                files[name]["matchids"] = sorted(set(matchids[name].tolist()))
+        frames = [frame for frame in (season, fresh) if not frame.empty]
+        if len(frames) == 1:
+            season = frames[0]
+        else:
+            season = compact_categories(pd.concat(frames, ignore_index=True)) if frames else pd.DataFrame()
+    if team_mapping_fp is None:
+        st.error("Team mapping could not be loaded, using teamid instead.")
+
+    # Per-file match counts only add up while every matchid lives in a single file
+    all_matchids = [matchid for fp in files.values() for matchid in fp["matchids"]]
+    added = added[0] if added else pd.DataFrame()
+    rebuilt = False
+    if season.empty:
+        players, match_log = pd.DataFrame(), pd.DataFrame()
+    elif players.empty or match_log.empty or len(all_matchids) != len(set(all_matchids)):
+        # Freshly parsed rows were already summed while they streamed in
+        matches = added if season is fresh else player_match_sums(season)
+        players, match_log = aggregate_players(matches), build_match_log(matches)
+        rebuilt = True
+    elif stale:
+        removed = player_match_sums(removed) if not removed.empty else removed
+        players = update_player_aggregate(players, added, removed)
+        match_log = update_match_log(match_log, added, removed)
+
+    new_manifest = {
+        "version": SNAPSHOT_VERSION,
+        "team_mapping": team_mapping_fp,
+        "files": files,
+        "rows": len(season),
+    }
+    if (new_manifest != manifest or rebuilt) and not season.empty:
+        save_snapshot(season.reset_index(drop=True), players, match_log, new_manifest, write_data=bool(stale) or rebuilt)
+    return season.reset_index(drop=True), players, match_log
+
+# Leaderboard specs - every player leaderboard is declared here and executed by run_leaderboard.
+# keys:         group order of the original raw-row leaderboards (it decides the order of ties)
+# gk_only:      read the GK_ columns and keep only players with goalkeeper appearances
+# columns:      label -> player summary column
+# derived:      label -> ('ratio', numerator, denominator, scale) or ('sum', left, right)
+# filters:      (label, op, value) applied before sorting; post_filters are applied after ranking.
+#               A value of 'median' compares against the median of the rows present at that step.
+# sort:         (labels, ascending); rank: label to dense-rank descending; output: final columns
+TEAM_FIRST = ['team', 'playerid', 'Player_FN']
+FILTER_OPS = {'!=': np.not_equal, '>': np.greater, '>=': np.greater_equal}
+
+LEADERBOARD_SPECS: Dict[str, Dict[str, Any]] = {
+    "Goals": {
+        "desc": "Goal Scored By Players",
+        "keys": TEAM_FIRST,
+        "columns": {"Matches": "Matches", "Goals": "Goals"},
+        "sort": (["Goals", "Matches"], [False, True]),
+        "rank": "Goals",
+        "post_filters": [("Goals", "!=", 0)],
+        "output": ["Rank", "Name", "Team", "Goals"],
+    },
+    "Detailed Goals": {
+        "desc": "Detailed Goal Statistics For Players",
+        "keys": TEAM_FIRST,
+        "columns": {
+            "Matches": "Matches", "Goals": "Goals", "Left": "left_goals",
+            "Right": "right_goals", "Head": "head_goals", "Penalty": "penalty_goals",
+        },
+        "sort": (["Goals", "Matches"], [False, True]),
+        "rank": "Goals",
+        "post_filters": [("Goals", "!=", 0)],
+        "output": ["Rank", "Name", "Team", "Left", "Right", "Head", "Penalty", "Goals"],
+    },
+    "Detailed Shots Per Match": {
+        "desc": "Detailed Shots Statistics For Players",
+        "keys": TEAM_FIRST,
+        "columns": {"Matches": "Matches", "Goals": "Goals", "Shots": "shots", "ShotsOT": "shots_on_target"},
+        "filters": [("Shots", ">", 0)],
+        "derived": {
+            "Shots Per Match": ("ratio", "Shots", "Matches", 1),
+            "Shots On Target Per Match": ("ratio", "ShotsOT", "Matches", 1),
+            "Goals Per Match": ("ratio", "Goals", "Matches", 1),
+        },
+        "sort": (["Shots Per Match"], [False]),
+        "output": ["Name", "Team", "Shots Per Match", "Shots On Target Per Match", "Goals Per Match"],
+    },
+    "Shot Accuracy": {
+        "desc": "Shot Accuracy By Players",
+        "columns": {"Matches": "Matches", "Shots_On_Target": "shots_on_target", "Shots": "shots"},
+        "derived": {"Shot_Accuracy": ("ratio", "Shots_On_Target", "Shots", 100)},
+        "filters": [("Matches", ">=", 3)],
+        "sort": (["Shot_Accuracy"], [False]),
+        "post_filters": [("Matches", ">", "median"), ("Shots", "!=", 0)],
+        "output": ["Name", "Team", "Shots", "Shot_Accuracy"],
+    },
+    "Assists": {
+        "desc": "Assists By Players",
+        "columns": {"Matches": "Matches", "Assists": "Assists"},
+        "sort": (["Assists", "Matches"], [False, True]),
+        "rank": "Assists",
+        "post_filters": [("Assists", "!=", 0)],
+        "output": ["Rank", "Name", "Team", "Assists"],
+    },
+    "Goals + Assists": {
+        "desc": "Goals + Assists By Players",
+        "columns": {"Matches": "Matches", "Goals": "Goals", "Assists": "Assists"},
+        "derived": {"Goals + Assists": ("sum", "Goals", "Assists")},
+        "filters": [("Goals + Assists", "!=", 0)],
+        "sort": (["Goals + Assists", "Matches"], [False, True]),
+        "rank": "Goals + Assists",
+        "output": ["Rank", "Name", "Team", "Goals + Assists"],
+    },
+    "Chances Created": {
+        "desc": "Chances Created By Players",
+        "columns": {"Matches": "Matches", "Chances Created": "chances_created"},
+        "sort": (["Chances Created", "Matches"], [False, True]),
+        "post_filters": [("Chances Created", "!=", 0)],
+        "output": ["Name", "Team", "Chances Created"],
+    },
+    "Tackles Per Match": {
+        "desc": "Tackles Per Match By Players",
+        "columns": {"Matches": "Matches", "Tackles": "tackles"},
+        "derived": {"Tackles Per Match": ("ratio", "Tackles", "Matches", 1)},
+        "sort": (["Tackles Per Match"], [False]),
+        "post_filters": [("Tackles Per Match", "!=", 0), ("Matches", ">=", 3)],
+        "output": ["Name", "Team", "Tackles", "Tackles Per Match"],
+    },
+    "Interceptions Per Match": {
+        "desc": "Interceptions Per Match By Players",
+        "columns": {"Matches": "Matches", "Interceptions": "interceptions"},
+        "derived": {"Interceptions Per Match": ("ratio", "Interceptions", "Matches", 1)},
+        "sort": (["Interceptions Per Match"], [False]),
+        "post_filters": [("Interceptions Per Match", "!=", 0), ("Matches", ">=", 3)],
+        "output": ["Name", "Team", "Interceptions", "Interceptions Per Match"],
+    },
+    "Blocks Per Match": {
+        "desc": "Blocks Per Match By Players",
+        "columns": {"Matches": "Matches", "Blocks": "blocks"},
+        "derived": {"Blocks Per Match": ("ratio", "Blocks", "Matches", 1)},
+        "sort": (["Blocks Per Match"], [False]),
+        "post_filters": [("Blocks Per Match", "!=", 0), ("Matches", ">=", 3)],
+        "output": ["Name", "Team", "Blocks", "Blocks Per Match"],
+    },
+    "Defender Saves": {
+        "desc": "Total Saves By Defenders",
+        "columns": {"Defender Saves": "defender_saves"},
+        "filters": [("Defender Saves", "!=", 0)],
+        "sort": (["Defender Saves"], [False]),
+        "output": ["Name", "Team", "Defender Saves"],
+    },
+    "Goalkeeper Saves": {
+        "desc": "Total Saves By Goalkeepers",
+        "columns": {"Penalty Saves": "penalty_saves", "Saves": "saves"},
+        "sort": (["Saves"], [False]),
+        "post_filters": [("Saves", "!=", 0)],
+        "output": ["Name", "Team", "Penalty Saves", "Saves"],
+    },
+    "Goalkeeper Clean Sheets": {
+        "desc": "Clean Sheets By Goalkeepers",
+        "gk_only": True,
+        "columns": {"Clean Sheets": "clean_sheets"},
+        "sort": (["Clean Sheets"], [False]),
+        "post_filters": [("Clean Sheets", "!=", 0)],
+        "output": ["Name", "Team", "Clean Sheets"],
+    },
+    "Goalkeeper Save Percentage": {
+        "desc": "Save Percentage By Goalkeepers",
+        "gk_only": True,
+        "columns": {"Saves": "saves", "Shots_faced": "shots_faced"},
+        "derived": {"Save Percentage": ("ratio", "Saves", "Shots_faced", 100)},
+        "sort": (["Save Percentage"], [False]),
+        "post_filters": [("Saves", ">", "median")],
+        "output": ["Name", "Team", "Saves", "Save Percentage"],
+    },
+    "Offsides": {
+        "desc": "Offside Statistics By Players",
+        "columns": {"Offside": "offsides"},
+        "sort": (["Offside"], [False]),
+        "post_filters": [("Offside", "!=", 0)],
+        "output": ["Name", "Team", "Offside"],
+    },
+    "Fouls": {
+        "desc": "Fouls Committed By Players",
+        "columns": {"Fouls": "fouls"},
+        "sort": (["Fouls"], [False]),
+        "rank": "Fouls",
+        "post_filters": [("Fouls", "!=", 0)],
+        "output": ["Rank", "Name", "Team", "Fouls"],
+    },
+    "Yellow Cards": {
+        "desc": "Yellow Cards Received By Players",
+        "columns": {"Yellow Cards": "yellow_cards"},
+        "sort": (["Yellow Cards"], [False]),
+        "post_filters": [("Yellow Cards", "!=", 0)],
+        "output": ["Name", "Team", "Yellow Cards"],
+    },
+    "Red Cards": {
+        "desc": "Red Cards Received By Players",
+        "columns": {"Red Cards": "red_cards"},
+        "sort": (["Red Cards"], [False]),
+        "post_filters": [("Red Cards", "!=", 0)],
+        "output": ["Name", "Team", "Red Cards"],
+    },
+}
+
+# Team leaderboard specs - run by the same engine on the team summary (one row per team)
+TEAM_LEADERBOARD_SPECS: Dict[str, Dict[str, Any]] = {
+    "Goals By Teams": {
+        "desc": "Goal Scored By Teams",
+        "keys": ['team'],
+        "columns": {"Matches": "Matches", "Goals": "Goals"},
+        "sort": (["Goals", "Matches"], [False, True]),
+        "rank": "Goals",
+        "output": ["Rank", "Team", "Goals"],
+    },
+    "Shots Stats By Teams": {
+        "desc": "Shot Stats By Teams",
+        "keys": ['team'],
+        "columns": {"Matches": "Matches", "Goals": "Goals", "Shots": "shots", "ShotsOT": "shots_on_target"},
+        "derived": {
+            "Shots Per Match": ("ratio", "Shots", "Matches", 1),
+            "Shots On Target Per Match": ("ratio", "ShotsOT", "Matches", 1),
+            "Goals Per Match": ("ratio", "Goals", "Matches", 1),
+        },
+        "sort": (["Shots Per Match"], [False]),
+        "output": ["Team", "Shots Per Match", "Shots On Target Per Match", "Goals Per Match"],
+    },
+    "Cards By Teams": {
+        "desc": "Fouls And Cards By Teams",
+        "keys": ['team'],
+        "columns": {"Matches": "Matches", "Fouls": "fouls", "Yellow Cards": "yellow_cards", "Red Cards": "red_cards"},
+        "derived": {"Fouls Per Match": ("ratio", "Fouls", "Matches", 1)},
+        "sort": (["Yellow Cards", "Red Cards", "Fouls"], [False, False, False]),
+        "output": ["Team", "Fouls", "Yellow Cards", "Red Cards", "Fouls Per Match"],
+    },
+    "Defensive Actions By Teams": {
+        "desc": "Tackles, Interceptions And Blocks By Teams",
+        "keys": ['team'],
+        "columns": {
+            "Matches": "Matches", "Tackles": "tackles", "Interceptions": "interceptions",
+            "Blocks": "blocks", "Defender Saves": "defender_saves",
+        },
+        "derived": {
+            "Tackles + Interceptions": ("sum", "Tackles", "Interceptions"),
+            "Defensive Actions": ("sum", "Tackles + Interceptions", "Blocks"),
+            "Defensive Actions Per Match": ("ratio", "Defensive Actions", "Matches", 1),
+        },
+        "sort": (["Defensive Actions Per Match"], [False]),
+        "output": ["Team", "Tackles", "Interceptions", "Blocks", "Defender Saves", "Defensive Actions Per Match"],
+    },
+    "Goalkeeping By Teams": {
+        "desc": "Goalkeeper Numbers By Teams",
+        "keys": ['team'],
+        "columns": {
+            "Matches": "Matches", "Clean Sheets": "GK_clean_sheets", "Saves": "GK_saves",
+            "Penalty Saves": "GK_penalty_saves", "Shots_faced": "GK_shots_faced",
+        },
+        "derived": {"Save Percentage": ("ratio", "Saves", "Shots_faced", 100)},
+        "sort": (["Clean Sheets", "Save Percentage"], [False, False]),
+        "output": ["Team", "Clean Sheets", "Saves", "Penalty Saves", "Save Percentage"],
+    },
+}
+
+# Function to order rows exactly like DataFrame.sort_values
+def sort_indexer(values: Dict[str, np.ndarray], by: List[str], ascending: List[bool],
+                 keep: Optional[np.ndarray] = None, stop: Optional[int] = None) -> np.ndarray:
+    """Return the kept rows in the order sort_values(by, ascending) would produce, ties included, cut at stop."""
+    n_rows = len(values[by[0]])
+    keep = np.ones(n_rows, dtype=bool) if keep is None else keep
+    if len(by) == 1:
+        # sort_values on one column is an unstable quicksort run over the reversed rows when descending.
+        # Its tie order depends on every row present, so all rows are sorted before the mask applies.
+        column = values[by[0]]
+        if ascending[0]:
+            order = column.argsort(kind='quicksort')
+        else:
+            reversed_idx = np.arange(n_rows)[::-1]
+            order = reversed_idx[column[::-1].argsort(kind='quicksort')][::-1]
+        return order[keep[order]][:stop]
+    # Several columns use a stable lexicographic sort, so only rows that can reach the top need sorting
+    rows = np.flatnonzero(keep)
+    sort_keys = [values[label][rows] if asc else -values[label][rows] for label, asc in zip(by, ascending)]
+    if stop is not None and stop < len(rows):
+        leaders = sort_keys[0] <= np.partition(sort_keys[0], stop - 1)[stop - 1]
+        rows = rows[leaders]
+        sort_keys = [key[leaders] for key in sort_keys]
+    return rows[np.lexsort(sort_keys[::-1])][:stop]
+
+# Function to evaluate spec filters on the current rows
+def filter_mask(values: Dict[str, np.ndarray], filters: List[Tuple[str, str, Any]], n_rows: int) -> np.ndarray:
+    """AND together spec filters; medians are taken over the rows present before any of them apply."""
+    mask = np.ones(n_rows, dtype=bool)
+    for label, op, target in filters:
+        column = values[label]
+        if target == 'median':
+            target = np.median(column) if n_rows else np.nan
+        mask &= FILTER_OPS[op](column, target)
+    return mask
+
+# Function to execute a leaderboard spec
+def run_leaderboard(spec: Dict[str, Any], summary: pd.DataFrame, limit: Optional[int] = None, offset: int = 0,
+                    team: Optional[str] = None) -> pd.DataFrame:
+    """Build rows [offset, offset + limit) of a leaderboard from a player or team summary; attrs["total_rows"] has the full count.
+
+    A team keeps only that team's rows; ranks and median thresholds stay league-wide.
+    """
+    prefix = 'GK_' if spec.get("gk_only") else ''
+    index = summary.index
+    level_codes = {name: pd.factorize(index.get_level_values(name), sort=True) for name in index.names}
+
+    # Start from the group order the raw-row leaderboards had
+    keys = spec.get("keys", PLAYER_KEYS)
+    rows = np.lexsort([level_codes[key][0] for key in reversed(keys)])
+    if spec.get("gk_only"):
+        rows = rows[summary['GK_Matches'].to_numpy()[rows] > 0]
+    values = {label: summary[prefix + column].to_numpy()[rows] for label, column in spec["columns"].items()}
+    for label, (kind, left, right, *scale) in spec.get("derived", {}).items():
+        if kind == 'sum':
+            values[label] = values[left] + values[right]
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = (values[left] / values[right]) * scale[0]
+            values[label] = np.round(np.where(np.isnan(ratio), 0, ratio), 1)
+
+    def take(selection: np.ndarray) -> None:
+        nonlocal rows
+        rows = rows[selection]
+        for label in values:
+            values[label] = values[label][selection]
+
+    take(filter_mask(values, spec.get("filters", []), len(rows)))
+    # Dense ranks and post-filter medians cover every row present after the filters, whatever the page
+    distinct = np.unique(-values[spec["rank"]]) if spec.get("rank") else None
+    keep = filter_mask(values, spec.get("post_filters", []), len(rows))
+    team_codes, teams = level_codes['team']
+    if team is not None:
+        keep &= team_codes[rows] == (teams.get_loc(team) if team in teams else -1)
+    total_rows = int(keep.sum())
+    by, ascending = spec["sort"]
+    stop = None if limit is None else offset + limit
+    take(sort_indexer(values, by, ascending, keep, stop)[offset:])
+    if distinct is not None:
+        values["Rank"] = np.searchsorted(distinct, -values[spec["rank"]]) + 1
+
+    # Names are title-cased once per distinct name rather than once per row
+    if "Name" in spec["output"]:
+        name_codes, names = level_codes['Player_FN']
+        values["Name"] = np.asarray([name.title() for name in names], dtype=object)[name_codes[rows]]
+    values["Team"] = np.asarray(teams, dtype=object)[team_codes[rows]]
+    result = pd.DataFrame({label: values[label] for label in spec["output"]})
+    result.attrs["total_rows"] = total_rows
+    return result
+
+# Form leaderboard specs - run on the form summary (each player's last matches, see form_totals)
+FORM_LEADERBOARD_SPECS: Dict[str, Dict[str, Any]] = {
+    "Goals + Assists Form": {
+        "desc": "Goals + Assists In Each Player's Last Matches",
+        "columns": {"Matches": "Matches", "Goals": "Goals", "Assists": "Assists"},
+        "derived": {"Goals + Assists": ("sum", "Goals", "Assists")},
+        "filters": [("Goals + Assists", "!=", 0)],
+        "sort": (["Goals + Assists", "Matches"], [False, True]),
+        "rank": "Goals + Assists",
+        "output": ["Rank", "Name", "Team", "Matches", "Goals", "Assists", "Goals + Assists"],
+    },
+    "Tackles Form": {
+        "desc": "Tackles In Each Player's Last Matches",
+        "columns": {"Matches": "Matches", "Tackles": "tackles"},
+        "derived": {"Tackles Per Match": ("ratio", "Tackles", "Matches", 1)},
+        "filters": [("Tackles", "!=", 0)],
+        "sort": (["Tackles", "Matches"], [False, True]),
+        "output": ["Name", "Team", "Matches", "Tackles", "Tackles Per Match"],
+    },
+    "Saves Form": {
+        "desc": "Saves In Each Goalkeeper's Last Matches",
+        "gk_only": True,
+        "columns": {"Matches": "Matches", "Saves": "saves", "Shots_faced": "shots_faced"},
+        "derived": {"Save Percentage": ("ratio", "Saves", "Shots_faced", 100)},
+        "filters": [("Saves", "!=", 0)],
+        "sort": (["Saves", "Matches"], [False, True]),
+        "output": ["Name", "Team", "Matches", "Saves", "Save Percentage"],
+    },
+}
+
+# Dictionary mapping stat names to leaderboard functions and their descriptions;
+# "level" says whether the function takes the player, team or form summary
+STAT_FUNCTIONS = {
+    name: {"func": functools.partial(run_leaderboard, spec), "desc": spec["desc"], "spec": spec, "level": level}
+    for level, specs in [("player", LEADERBOARD_SPECS), ("team", TEAM_LEADERBOARD_SPECS), ("form", FORM_LEADERBOARD_SPECS)]
+    for name, spec in specs.items()
+}
+
+def totalgoals(df: pd.DataFrame) -> pd.DataFrame:
+    df_summary = df['Goals'].sum()
+    df_summary=(int(df_summary))+2
+    return df_summary
+
+def tpp(df: pd.DataFrame) -> pd.DataFrame:
+    df_summary = df['playerid'].nunique()
+    return df_summary
+
+
+# Shared dataset and leaderboard caches (process-wide, shared by every session)
+RESULT_CACHE_ENTRIES = 64
+
+# Leaderboards precomputed by precompute.py (JSON and CSV per stat plus a manifest);
+# form tables depend on the chosen number of matches, so they are always computed on request
+EXPORT_DIR = "exports"
+EXPORT_MANIFEST = "manifest.json"
+EXPORTED_STATS = [stat_name for stat_name, entry in STAT_FUNCTIONS.items() if entry["level"] != "form"]
+# The engine code this process runs; exports written by any other version are not served
+ENGINE_VERSION = engine_version()
+
+# Function to list the values offered by the sidebar filters
+def filter_options(season: pd.DataFrame) -> Dict[str, List[Any]]:
+    """Sorted matchids, teams and positions present in the season frame."""
+    return {
+        "matchids": sorted(int(m) for m in season['matchid'].unique()),
+        "teams": sorted(str(t) for t in season['team'].dropna().unique()),
+        "positions": sorted(str(p) for p in season['position'].dropna().unique()),
+    }
+
+# Function to list the leaderboards for the sidebar
+def stat_catalog() -> Dict[str, Dict[str, str]]:
+    """Description and level of every STAT_FUNCTIONS entry, in sidebar order."""
+    return {name: {"desc": entry["desc"], "level": entry["level"]} for name, entry in STAT_FUNCTIONS.items()}
+
+# Function to record what the app's first render needs
+def save_startup(version: str, metrics: Dict[str, int], filters: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """Write the header metrics, filter options and stat list for the next cold start and return them; write failures only warn."""
+    stats = stat_catalog()
+    try:
+        save_startup_summary(version, metrics, filters, stats)
+    except OSError as e:
+        st.warning(f"Could not write startup summary: {str(e)}")
+    return {"version": version, "metrics": metrics, "filters": filters, "stats": stats}
+
+# Function to load the dataset snapshot shared by all sessions
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_shared_dataset(version: str) -> Dict[str, Any]:
+    """Load the season frame, player and team summaries and form index once per input version; callers must treat it as read-only."""
+    record_cache("dataset", misses=1)
+    season, players, match_log = load_season_data()
+    if season.empty:
+        return {"version": version, "season": season, "summary": None}
+    summary = build_player_summary(players)
+    player_partials = build_match_partials(season, PLAYER_KEYS)
+    team_matches = build_team_matches(player_partials)
+    filters = filter_options(season)
+    metrics = {"total_goals": int(totalgoals(season)), "players_played": int(tpp(season))}
+    return {
+        "version": version,
+        "season": season,
+        "summary": summary,
+        "team_summary": build_team_summary(summary, team_match_counts(team_matches, 0, team_matches["radix"] - 1)),
+        "partials": {
+            "player": player_partials,
+            "position": build_match_partials(season, PLAYER_KEYS + ['position']),
+        },
+        "team_matches": team_matches,
+        "form": build_form_index(match_log),
+        "filters": filters,
+        **metrics,
+        "startup": save_startup(version, metrics, filters),
+    }
+
+# Function to load the player index once per dataset version
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_player_index(version: str) -> Dict[str, Any]:
+    """Player index over the shared season frame; built on first use of the player page."""
+    record_cache("player_index", misses=1)
+    record_cache("dataset", lookups=1)
+    with track_stage("player_index") as record:
+        index = build_player_index(load_shared_dataset(version)["season"])
+        record["rows"] = len(index["ids"])
+    return index
+
+# Function to load precomputed leaderboards built from the current inputs
+def load_exported_leaderboards(version: str) -> Optional[Dict[str, Any]]:
+    """Read the leaderboards written by precompute.py, or None if they are missing, incomplete or stale.
+
+    The manifest is re-stat'ed on every call, so exports written after a miss are picked up.
+    """
+    try:
+        stamp = os.stat(os.path.join(EXPORT_DIR, EXPORT_MANIFEST)).st_mtime_ns
+    except OSError:
+        return None
+    return read_exported_leaderboards(version, stamp)
+
+# Function to read one written manifest and its leaderboards
+@st.cache_resource(max_entries=1, show_spinner=False)
+def read_exported_leaderboards(version: str, stamp: int) -> Optional[Dict[str, Any]]:
+    """Cached per dataset version and manifest mtime, so a miss only lasts until precompute.py replaces the manifest."""
+    record_cache("exports", misses=1)
+    try:
+        with open(os.path.join(EXPORT_DIR, EXPORT_MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != version or manifest.get("engine") != ENGINE_VERSION:
+            return None
+        if set(EXPORTED_STATS) - set(manifest.get("stats", {})) or "filters" not in manifest:
+            return None
+        boards = {}
+        for stat_name in EXPORTED_STATS:
+            with open(os.path.join(EXPORT_DIR, manifest["stats"][stat_name]["json"]), encoding="utf-8") as f:
+                board = json.load(f)
+            boards[stat_name] = pd.DataFrame(board["data"], columns=board["columns"])
+        return {"metrics": manifest["metrics"], "filters": manifest["filters"], "boards": boards}
+    except (OSError, ValueError, KeyError):
+        return None
+
+# Function to compute the player summary of a match window once per dataset version
+@st.cache_resource(max_entries=RESULT_CACHE_ENTRIES, show_spinner=False)
+def compute_window_summary(version: str, first: Optional[int], last: Optional[int], position: Optional[str]) -> pd.DataFrame:
+    """Player summary for a match window and position, from the shared per-match partial aggregates."""
+    record_cache("window_summaries", misses=1)
+    record_cache("dataset", lookups=1)
+    dataset = load_shared_dataset(version)
+    matchids = dataset["filters"]["matchids"]
+    first = matchids[0] if first is None else first
+    last = matchids[-1] if last is None else last
+    with track_stage("window_summary") as record:
+        summary = build_window_summary(dataset["partials"], first, last, position)
+        record["rows"] = len(summary)
+    return summary
+
+# Function to compute the team summary of a match window once per dataset version
+@st.cache_resource(max_entries=RESULT_CACHE_ENTRIES, show_spinner=False)
+def compute_team_summary(version: str, first: Optional[int], last: Optional[int], position: Optional[str]) -> pd.DataFrame:
+    """Team rollup of the match-window player summary, with each team's distinct matches in the window."""
+    record_cache("team_summaries", misses=1)
+    record_cache("dataset", lookups=1)
+    dataset = load_shared_dataset(version)
+    matchids = dataset["filters"]["matchids"]
+    record_cache("window_summaries", lookups=1)
+    summary = compute_window_summary(version, first, last, position)
+    first = matchids[0] if first is None else first
+    last = matchids[-1] if last is None else last
+    with track_stage("team_summary") as record:
+        teams = build_team_summary(summary, team_match_counts(dataset["team_matches"], first, last))
+        record["rows"] = len(teams)
+    return teams
+
+# Function to compute the form summary of a match window once per dataset version
+@st.cache_resource(max_entries=RESULT_CACHE_ENTRIES, show_spinner=False)
+def compute_form_summary(version: str, first: Optional[int], last: Optional[int], window: int) -> pd.DataFrame:
+    """Each player's totals over their last `window` matches inside the match window, from the shared form index."""
+    record_cache("form_summaries", misses=1)
+    record_cache("dataset", lookups=1)
+    dataset = load_shared_dataset(version)
+    matchids = dataset["filters"]["matchids"]
+    first = matchids[0] if first is None else first
+    last = matchids[-1] if last is None else last
+    with track_stage("form_summary") as record:
+        summary = form_totals(dataset["form"], first, last, window)
+        record["rows"] = len(summary)
+    return summary
+
+# Function to compute a leaderboard page once per dataset version and filter set
+@st.cache_resource(max_entries=RESULT_CACHE_ENTRIES, show_spinner=False)
+def compute_leaderboard(stat_name: str, version: str, first: Optional[int] = None, last: Optional[int] = None,
+                        position: Optional[str] = None, team: Optional[str] = None,
+                        limit: Optional[int] = None, offset: int = 0, form_window: Optional[int] = None) -> pd.DataFrame:
+    """Run a STAT_FUNCTIONS entry on the shared (or match-window) player, team or form summary; the result is shared read-only.
+
+    Form tables take each player's last form_window matches and ignore the position filter.
+    """
+    record_cache("leaderboards", misses=1)
+    entry = STAT_FUNCTIONS[stat_name]
+    if entry["level"] == "form":
+        record_cache("form_summaries", lookups=1)
+        summary = compute_form_summary(version, first, last, form_window or FORM_WINDOW)
+    elif first is None and last is None and position is None:
+        record_cache("dataset", lookups=1)
+        summary = load_shared_dataset(version)["summary" if entry["level"] == "player" else "team_summary"]
+    elif entry["level"] == "player":
+        record_cache("window_summaries", lookups=1)
+        summary = compute_window_summary(version, first, last, position)
+    else:
+        record_cache("team_summaries", lookups=1)
+        summary = compute_team_summary(version, first, last, position)
+    with track_stage(f"stat:{stat_name}") as record:
+        result = entry["func"](summary, limit=limit, offset=offset, team=team)
+        record["rows"] = len(result)
+    return result
+
+# Function to cut one page out of a full leaderboard
+def page_leaderboard(result_df: pd.DataFrame, team: Optional[str], limit: Optional[int], offset: int) -> pd.DataFrame:
+    """Keep one team's rows (ranks stay league-wide) and return rows [offset, offset + limit) like run_leaderboard."""
+    if team is not None:
+        result_df = result_df[result_df['Team'] == team]
+    page = result_df.iloc[offset:None if limit is None else offset + limit].reset_index(drop=True)
+    page.attrs["total_rows"] = len(result_df)
+    return page
+
+# Function to fetch one page of the selected leaderboard
+def fetch_leaderboard_page(stat_name: str, version: str, exported: Optional[Dict[str, Any]],
+                           filters: Dict[str, Any], limit: int, offset: int) -> pd.DataFrame:
+    """Slice the precomputed board when it covers the filters, else compute just the requested page."""
+    if STAT_FUNCTIONS[stat_name]["level"] == "form":
+        record_cache("leaderboards", lookups=1)
+        return compute_leaderboard(stat_name, version, filters["first"], filters["last"], None, filters["team"],
+                                   limit, offset, filters.get("form_window", FORM_WINDOW))
+    window = (filters["first"], filters["last"], filters["position"])
+    if exported is not None and window == (None, None, None):
+        return page_leaderboard(exported["boards"][stat_name], filters["team"], limit, offset)
+    # Exports only cover the whole season, so filtered views compute from the shared dataset
+    record_cache("leaderboards", lookups=1)
+    return compute_leaderboard(stat_name, version, *window, filters["team"], limit, offset)
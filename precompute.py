@@ -0,0 +1,124 @@
+"""Precompute every leaderboard and the header metrics as static JSON/CSV files.
+
+The app serves these files directly while they match the current input files.
+Every run also builds the data snapshot and the startup summary, so it doubles as the
+warm-up step before a deployment. Rerun after every match upload:
+    python precompute.py
+    python precompute.py --workers 4 --output-dir exports
+    python precompute.py --snapshot-only
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+import streamlit  # noqa: F401  (imported first so the logger level below sticks)
+
+# engine.py calls Streamlit at import and while loading; outside `streamlit run` those calls only log warnings
+logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').setLevel(logging.ERROR)
+import engine  # noqa: E402
+from datafiles import dataset_version  # noqa: E402
+
+# Per-worker state set once by the pool initializer
+_worker: Dict[str, Any] = {}
+
+# Function to turn a stat name into a file name
+def slugify(stat_name: str) -> str:
+    """Lower-case the name and collapse everything but letters and digits into dashes."""
+    return re.sub(r'[^a-z0-9]+', '-', stat_name.lower()).strip('-')
+
+# Function to write a file atomically
+def write_atomic(path: str, text: str) -> None:
+    """Write text to a temporary file and move it over path."""
+    with open(path + ".tmp", "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+# Function to set up a pool worker
+def init_worker(summaries: Dict[str, pd.DataFrame], output_dir: str, version: str) -> None:
+    """Keep the player and team summaries and export settings for every task run by this worker."""
+    _worker.update(summaries=summaries, output_dir=output_dir, version=version)
+
+# Function to compute and write one leaderboard
+def export_stat(stat_name: str) -> Tuple[str, Dict[str, Any]]:
+    """Run one EXPORTED_STATS entry and write it as <slug>.json and <slug>.csv."""
+    entry = engine.STAT_FUNCTIONS[stat_name]
+    result = entry["func"](_worker["summaries"][entry["level"]])
+    slug = slugify(stat_name)
+    board = {
+        "name": stat_name,
+        "desc": entry["desc"],
+        "version": _worker["version"],
+        **json.loads(result.to_json(orient="split", index=False)),
+    }
+    write_atomic(os.path.join(_worker["output_dir"], f"{slug}.json"), json.dumps(board))
+    write_atomic(os.path.join(_worker["output_dir"], f"{slug}.csv"), result.to_csv(index=False))
+    return stat_name, {"desc": entry["desc"], "json": f"{slug}.json", "csv": f"{slug}.csv", "rows": len(result)}
+
+# Function to build the snapshot and startup summary ahead of the first visitor
+def warm_up() -> Tuple[str, pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
+    """Load (and snapshot) the season data and write the startup summary the app renders its first screen from."""
+    version = dataset_version()
+    season, players, _ = engine.load_season_data()
+    if season.empty:
+        raise RuntimeError("no match data could be loaded")
+    metrics = {"total_goals": int(engine.totalgoals(season)), "players_played": int(engine.tpp(season))}
+    startup = engine.save_startup(version, metrics, engine.filter_options(season))
+    return version, season, players, startup
+
+# Function to export every leaderboard
+def export_all(output_dir: str, workers: Optional[int]) -> Dict[str, Any]:
+    """Load the data once, export every leaderboard (in parallel when workers > 1) and write the manifest."""
+    version, season, players, startup = warm_up()
+    summary = engine.build_player_summary(players)
+    team_matches = engine.build_team_matches(engine.build_match_partials(season, engine.PLAYER_KEYS))
+    team_summary = engine.build_team_summary(summary, engine.team_match_counts(team_matches, 0, team_matches["radix"] - 1))
+    os.makedirs(output_dir, exist_ok=True)
+
+    init_args = ({"player": summary, "team": team_summary}, output_dir, version)
+    if workers == 1:
+        init_worker(*init_args)
+        stats = dict(map(export_stat, engine.EXPORTED_STATS))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=init_args) as pool:
+            stats = dict(pool.map(export_stat, engine.EXPORTED_STATS))
+
+    # The manifest goes last so readers never see it point at a missing leaderboard
+    manifest = {
+        "version": version,
+        "engine": engine.ENGINE_VERSION,
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "metrics": startup["metrics"],
+        "stats": {stat_name: stats[stat_name] for stat_name in engine.EXPORTED_STATS},
+        "filters": startup["filters"],
+    }
+    write_atomic(os.path.join(output_dir, engine.EXPORT_MANIFEST), json.dumps(manifest, indent=2))
+    return manifest
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Precompute all leaderboards as static JSON and CSV files.")
+    parser.add_argument("--output-dir", default=engine.EXPORT_DIR, help="directory for the exported files")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per core, 1 runs inline)")
+    parser.add_argument("--snapshot-only", action="store_true",
+                        help="only build the data snapshot and startup summary, without exports")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.snapshot_only:
+        version = warm_up()[0]
+        print(f"Built the snapshot and startup summary in {time.perf_counter() - start:.2f}s (version {version})")
+        return 0
+    manifest = export_all(args.output_dir, args.workers)
+    print(f"Exported {len(manifest['stats'])} leaderboards to {args.output_dir} "
+          f"in {time.perf_counter() - start:.2f}s (version {manifest['version']})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())